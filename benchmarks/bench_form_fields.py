@@ -0,0 +1,51 @@
+"""Benchmark rendering a large form whose fields get automatic IDs.
+
+Every field helper that isn't given an explicit ``id`` derives one from the
+field name with ``_make_safe_id_component()``, so this times that function
+on its own and a form of many fields. With WebHelpers2 importable (e.g.,
+installed with ``pip install -e .``), run::
+
+    python benchmarks/bench_form_fields.py
+"""
+
+from __future__ import print_function
+import timeit
+
+from webhelpers2.html.tags import _make_safe_id_component
+from webhelpers2.html.tags import Options
+from webhelpers2.html.tags import checkbox, hidden, select, text, textarea
+
+NAMES = ["rows-{0}.{1}".format(i, field) for i in range(200)
+    for field in ["first name", "last_name", "e-mail", "notes"]]
+OPTIONS = Options()
+for value, label in [("a", "Active"), ("i", "Inactive"), ("s", "Suspended")]:
+    OPTIONS.add_option(label, value)
+
+def safe_ids():
+    return [_make_safe_id_component(x) for x in NAMES]
+
+def form_fields():
+    fields = []
+    for i, name in enumerate(NAMES):
+        kind = i % 5
+        if kind == 0:
+            fields.append(text(name, "value"))
+        elif kind == 1:
+            fields.append(hidden(name, i))
+        elif kind == 2:
+            fields.append(checkbox(name, checked=i % 2))
+        elif kind == 3:
+            fields.append(select(name, "a", OPTIONS))
+        else:
+            fields.append(textarea(name, "Some notes"))
+    return fields
+
+def main():
+    number = 5
+    for func in [safe_ids, form_fields]:
+        best = min(timeit.repeat(func, number=number, repeat=5))
+        msec = best / number * 1e3
+        print("{0:<20} {1:8.2f} msec per {2} fields".format(
+            func.__name__, msec, len(NAMES)))
+
+if __name__ == "__main__":  main()
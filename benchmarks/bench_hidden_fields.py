@@ -0,0 +1,37 @@
+"""Benchmark ``form()`` with a large ``hidden_fields`` mapping.
+
+Compare ``form(hidden_fields=...)``, which renders all hidden inputs in one
+join, against building the same form one ``hidden()`` call at a time. With
+WebHelpers2 importable (e.g., installed with ``pip install -e .``), run::
+
+    python benchmarks/bench_hidden_fields.py
+"""
+
+from __future__ import print_function
+import timeit
+
+from webhelpers2.html import HTML
+from webhelpers2.html.tags import form, hidden
+
+FIELDS = [("wizard.step{0}.answer".format(i), "value {0}".format(i))
+    for i in range(500)]
+
+def per_field():
+    inputs = [hidden(name, value, id=None) for name, value in FIELDS]
+    div = HTML.tag("div", style="display:none", _nl=True, *inputs)
+    return HTML.tag("form", div, _closed=False, action="/wizard",
+        method="post")
+
+def bulk():
+    return form("/wizard", hidden_fields=FIELDS)
+
+def main():
+    assert per_field() == bulk()
+    number = 20
+    for func in [per_field, bulk]:
+        best = min(timeit.repeat(func, number=number, repeat=5))
+        msec = best / number * 1e3
+        print("{0:<20} {1:8.2f} msec per {2} fields".format(
+            func.__name__, msec, len(FIELDS)))
+
+if __name__ == "__main__":  main()
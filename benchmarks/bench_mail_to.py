@@ -0,0 +1,42 @@
+"""Benchmark e-mail obfuscation for a directory-sized page.
+
+Time ``mail_to()`` with each ``encode`` mode, ``js_obfuscate()`` and
+``js_quote_string()`` over a batch of addresses. With WebHelpers2
+importable (e.g., installed with ``pip install -e .``), run::
+
+    python benchmarks/bench_mail_to.py
+"""
+
+from __future__ import print_function
+import timeit
+
+from webhelpers2.html.tools import js_obfuscate, js_quote_string, mail_to
+
+ADDRESSES = ["member{0}.name@department{1}.example.org".format(i, i % 17)
+    for i in range(2000)]
+
+def mail_to_plain():
+    return [mail_to(x) for x in ADDRESSES]
+
+def mail_to_hex():
+    return [mail_to(x, encode="hex") for x in ADDRESSES]
+
+def mail_to_javascript():
+    return [mail_to(x, encode="javascript") for x in ADDRESSES]
+
+def obfuscate():
+    return [js_obfuscate(x) for x in ADDRESSES]
+
+def quote():
+    return [js_quote_string(x) for x in ADDRESSES]
+
+def main():
+    number = 5
+    funcs = [mail_to_plain, mail_to_hex, mail_to_javascript, obfuscate, quote]
+    for func in funcs:
+        best = min(timeit.repeat(func, number=number, repeat=5))
+        msec = best / number * 1e3
+        print("{0:<20} {1:8.2f} msec per {2} addresses".format(
+            func.__name__, msec, len(ADDRESSES)))
+
+if __name__ == "__main__":  main()
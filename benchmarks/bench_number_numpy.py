@@ -0,0 +1,46 @@
+"""Benchmark the number statistics on large arrays, with and without NumPy.
+
+Time ``mean()``, ``median()``, ``standard_deviation()`` and ``quantiles()``
+on the same numbers as a list (pure Python), an ``array.array`` and a NumPy
+array (vectorized). NumPy must be installed. With WebHelpers2 importable
+(e.g., installed with ``pip install -e .``), run::
+
+    python benchmarks/bench_number_numpy.py [SIZE]
+
+SIZE is the number of elements, 10,000,000 by default.
+"""
+
+from __future__ import print_function
+import array
+import random
+import sys
+import timeit
+
+import numpy
+
+from webhelpers2.number import mean, median, quantiles, standard_deviation
+
+FUNCS = [
+    ("mean", mean),
+    ("median", median),
+    ("standard_deviation", standard_deviation),
+    ("quantiles", lambda r: quantiles(r, [0.5, 0.9, 0.99])),
+    ]
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10 ** 7
+    rand = random.Random(0)
+    values = [rand.gauss(100, 15) for i in range(size)]
+    inputs = [
+        ("list", values),
+        ("array.array", array.array("d", values)),
+        ("numpy.ndarray", numpy.array(values)),
+        ]
+    print("{0:,} elements".format(size))
+    for func_name, func in FUNCS:
+        for input_name, r in inputs:
+            seconds = min(timeit.repeat(lambda: func(r), number=1, repeat=3))
+            print("{0:<20} {1:<15} {2:10.2f} msec".format(func_name,
+                input_name, seconds * 1e3))
+
+if __name__ == "__main__":  main()
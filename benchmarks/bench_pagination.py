@@ -0,0 +1,57 @@
+"""Benchmark pagination-link generation.
+
+Compare ``update_params()`` with a reused ``ParamUpdater`` for the links
+of one listing page, and a pager built by hand from ``update_params()``,
+``link_to_if()`` and ``ul()`` with ``paginate_links()``. Both pagers show
+the same window of pages. With WebHelpers2 importable (e.g., installed
+with ``pip install -e .``), run::
+
+    python benchmarks/bench_pagination.py
+"""
+
+from __future__ import print_function
+import timeit
+
+from webhelpers2.html.tags import link_to_if, ul
+from webhelpers2.html.tools import ParamUpdater, paginate_links, update_params
+from webhelpers2.html.tools import _page_window
+
+BASE_URL = "http://example.com/articles?sort=date&order=desc&tag=python&page=7"
+LINKS_PER_PAGE = 50
+
+def with_update_params():
+    return [update_params(BASE_URL, page=i) for i in range(LINKS_PER_PAGE)]
+
+def with_param_updater():
+    page_url = ParamUpdater(BASE_URL)
+    return [page_url(page=i) for i in range(LINKS_PER_PAGE)]
+
+def pager_by_hand(page=500, page_count=1000):
+    items = []
+    for i in _page_window(page, page_count, 5):
+        if i is None:
+            items.append("...")
+        else:
+            href = update_params(BASE_URL, page=i)
+            items.append(link_to_if(i != page, str(i), href))
+    return ul(items)
+
+def pager_paginate_links(page=500, page_count=1000):
+    return paginate_links(BASE_URL, page, page_count, window=5)
+
+def report(funcs, number, unit):
+    for func in funcs:
+        best = min(timeit.repeat(func, number=number, repeat=5))
+        usec = best / number * 1e6
+        print("{0:<22} {1:10.1f} usec per {2}".format(
+            func.__name__, usec, unit))
+
+def main():
+    assert with_update_params() == with_param_updater()
+    assert pager_by_hand() == pager_paginate_links()
+    report([with_update_params, with_param_updater], 200,
+        "page of {0} links".format(LINKS_PER_PAGE))
+    report([pager_by_hand, pager_paginate_links], 20,
+        "pager of 15 items over 1000 pages")
+
+if __name__ == "__main__":  main()
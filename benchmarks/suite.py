@@ -0,0 +1,353 @@
+"""Time the public helpers at several input sizes and check for regressions.
+
+Each case runs at three sizes: "small" (a fragment of a page), "medium"
+(a typical page) and "huge" (a bulk export). The size is the number of
+tags, options, paragraphs, numbers, etc that one call processes; a case
+may lower it if the full size would be too slow. With WebHelpers2
+importable (e.g., installed with ``pip install -e .``), run::
+
+    python benchmarks/suite.py
+
+Options:
+
+``-o FILE``
+    Write the results to FILE as JSON.
+
+``-b FILE``
+    Compare the results with a baseline written earlier by ``-o``, and
+    exit with status 1 if any case got slower than the tolerance.
+
+``-t FRACTION``
+    The tolerance for ``-b``, as a fraction. Default 0.25, i.e., a case
+    counts as a regression if it takes more than 1.25 times its baseline
+    time.
+
+``-s SIZES``
+    Comma-separated list of sizes to run. Default "small,medium,huge".
+
+``-k TEXT``
+    Only run cases whose name contains TEXT.
+
+To track regressions in review, record a baseline on the reference branch
+and compare a change against it on the same machine. The Makefile scripts
+this with the checkout on ``PYTHONPATH``::
+
+    git checkout master
+    make bench-baseline     # Writes benchmarks/baseline.json
+    git checkout my-branch
+    make bench-check        # Exits with status 1 on a regression
+
+No baseline is committed because timings are only comparable on one
+machine; ``benchmarks/baseline.json`` is ignored by git, so it survives
+the checkout.
+
+Timings from different machines or Python versions aren't comparable, so
+the JSON records the Python version and platform and the comparison warns
+if they differ.
+
+The ``bench_*.py`` scripts in this directory are narrower benchmarks that
+compare alternative ways of doing one job.
+"""
+
+from __future__ import print_function
+import argparse
+import datetime
+import json
+import platform
+import random
+import sys
+import timeit
+
+from webhelpers2.containers import Counter, GridView, distribute
+from webhelpers2.date import distance_of_time_in_words
+from webhelpers2.html import HTML
+from webhelpers2.html.tags import Options, select
+from webhelpers2.html.tools import auto_link, bar_chart, highlight
+from webhelpers2.html.tools import html_to_text
+from webhelpers2.html.tools import sanitize, strip_tags, update_params
+from webhelpers2 import number
+from webhelpers2.number import format_data_size, mean, median
+from webhelpers2.number import quantiles, standard_deviation
+from webhelpers2.text import urlify
+
+SIZES = [("small", 10), ("medium", 1000), ("huge", 20000)]
+
+# The minimum total time of one timing run. The number of calls per run is
+# raised until a run takes at least this long.
+MIN_RUN_TIME = 0.2
+
+REPEAT = 3
+
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do "
+    "eiusmod tempor incididunt ut labore et dolore magna aliqua").split()
+
+#### Input generators ####
+
+def make_words(n, seed=0):
+    rand = random.Random(seed)
+    return [rand.choice(WORDS) for i in range(n)]
+
+def make_text(n):
+    """Return ``n`` sentences, some with a URL or e-mail address."""
+    sentences = []
+    for i, word in enumerate(make_words(n)):
+        if i % 3 == 0:
+            extra = "see http://www.example.com/{0}?page={1}".format(word, i)
+        elif i % 3 == 1:
+            extra = "mail {0}{1}@example.org".format(word, i)
+        else:
+            extra = "nothing to link"
+        sentences.append("The {0} item, {1}.".format(word, extra))
+    return " ".join(sentences)
+
+def make_html(n):
+    """Return a page of ``n`` paragraphs plus a table of ``n`` rows."""
+    words = make_words(n)
+    parts = ["<html><body><h1>Report</h1>"]
+    for i, word in enumerate(words):
+        parts.append('<p class="x">Item <b>{0}</b> and <a href="/{1}">'
+            '{0} link</a><br>second line<!-- note --></p>'.format(word, i))
+    parts.append("<table><tr><th>Name</th><th>Count</th></tr>")
+    for i, word in enumerate(words):
+        parts.append("<tr><td>{0}</td><td>{1}</td></tr>".format(word, i))
+    parts.append("</table></body></html>")
+    return "".join(parts)
+
+def make_numbers(n):
+    rand = random.Random(0)
+    return [rand.gauss(100, 15) for i in range(n)]
+
+#### Cases ####
+# Each case takes a size and returns a function of no arguments to time.
+
+def html_tag(n):
+    def run():
+        return [HTML.tag("td", "cell", class_="c", id="cell{0}".format(i))
+            for i in range(n)]
+    return run
+
+def select_tag(n):
+    options = Options()
+    for i in range(n):
+        options.add_option("Option {0}".format(i), str(i))
+    return lambda: select("choice", str(n // 2), options)
+
+def options_render(n):
+    options = Options(prompt="Pick one")
+    for i in range(n):
+        options.add_option("Option {0}".format(i), str(i))
+    return lambda: options.render([str(n // 2)])
+
+def auto_link_text(n):
+    text = make_text(n)
+    return lambda: auto_link(text)
+
+# auto_link's time grows much faster than linearly with the text length, so
+# a full-size huge run would take minutes.
+auto_link_text.sizes = {"huge": 2000}
+
+def highlight_text(n):
+    text = " ".join(make_words(n))
+    return lambda: highlight(text, "dolor")
+
+def html_to_text_page(n):
+    html = make_html(n)
+    return lambda: html_to_text(html)
+
+def sanitize_page(n):
+    html = make_html(n)
+    return lambda: sanitize(html)
+
+def strip_tags_page(n):
+    html = make_html(n)
+    return lambda: strip_tags(html)
+
+def urlify_title(n):
+    title = " ".join(make_words(n)).title() + "! & Co."
+    return lambda: urlify(title)
+
+def update_params_links(n):
+    url = "http://example.com/articles?sort=date&tag=python&page=1"
+    return lambda: [update_params(url, page=i) for i in range(n)]
+
+def distance_of_time(n):
+    start = datetime.datetime(2000, 1, 1)
+    ends = [start + datetime.timedelta(minutes=i * 997) for i in range(n)]
+    return lambda: [distance_of_time_in_words(start, x, "minute")
+        for x in ends]
+
+def format_data_sizes(n):
+    sizes = [i * 7919 ** 2 for i in range(n)]
+    return lambda: [format_data_size(x, "B", binary=i % 2)
+        for i, x in enumerate(sizes)]
+
+def format_data_sizes_batch(n):
+    sizes = [i * 7919 ** 2 for i in range(n)]
+    return lambda: (number.format_data_sizes(sizes[::2], "B"),
+        number.format_data_sizes(sizes[1::2], "B", binary=True))
+
+def percent_column(n):
+    parts = list(range(n))
+    wholes = [i % 7 * 50 for i in range(n)]
+    return lambda: number.format_percents(number.percents_of(parts, wholes))
+
+def histogram_chart(n):
+    numbers = make_numbers(n)
+    def run():
+        counts, edges = number.histogram(numbers, 20)
+        return bar_chart(counts)
+    return run
+
+def distribute_items(n):
+    items = make_words(n)
+    return lambda: (distribute(items, 3, "H"), distribute(items, 3, "V"))
+
+def grid_view_items(n):
+    items = make_words(n)
+    return lambda: [list(row) for row in GridView(items, 3, "V")]
+
+def counter_popular(n):
+    words = make_words(n)
+    return lambda: Counter.correlate(words).get_popular(5)
+
+def number_stats(n):
+    numbers = make_numbers(n)
+    return lambda: (mean(numbers), median(numbers),
+        standard_deviation(numbers))
+
+def number_quantiles(n):
+    numbers = make_numbers(n)
+    return lambda: (quantiles(numbers, [0.5, 0.9, 0.99]),
+        quantiles(numbers, [0.5, 0.9, 0.99], approximate=True))
+
+CASES = [
+    html_tag,
+    select_tag,
+    options_render,
+    auto_link_text,
+    highlight_text,
+    html_to_text_page,
+    sanitize_page,
+    strip_tags_page,
+    urlify_title,
+    update_params_links,
+    distance_of_time,
+    format_data_sizes,
+    format_data_sizes_batch,
+    distribute_items,
+    grid_view_items,
+    counter_popular,
+    number_stats,
+    number_quantiles,
+    histogram_chart,
+    percent_column,
+    ]
+
+#### Running and comparing ####
+
+def time_function(func):
+    """Return the best time per call in seconds, and calls per run."""
+    number = 1
+    while True:
+        elapsed = timeit.timeit(func, number=number)
+        if elapsed >= MIN_RUN_TIME:
+            break
+        # Aim a little past the minimum, growing at most tenfold per try.
+        estimate = number * 1.2 * MIN_RUN_TIME / max(elapsed, 1e-9)
+        number = min(number * 10, int(estimate) + 1)
+    best = min([elapsed] + timeit.repeat(func, number=number,
+        repeat=REPEAT - 1))
+    return best / number, number
+
+def run(sizes, keyword=None):
+    results = {}
+    for case in CASES:
+        if keyword and keyword not in case.__name__:
+            continue
+        for size_name, n in SIZES:
+            if size_name not in sizes:
+                continue
+            n = getattr(case, "sizes", {}).get(size_name, n)
+            name = "{0}/{1}".format(case.__name__, size_name)
+            seconds, number = time_function(case(n))
+            results[name] = {"seconds": seconds, "size": n, "number": number}
+            print("{0:<32} {1:>12}".format(name, format_time(seconds)))
+            sys.stdout.flush()
+    return results
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        }
+
+def compare(results, baseline, tolerance):
+    """Print a comparison with the baseline and return the regressions."""
+    env = environment()
+    for key, value in sorted(env.items()):
+        if baseline.get("environment", {}).get(key) != value:
+            print("Warning: baseline {0} is {1!r}, not {2!r}".format(key,
+                baseline.get("environment", {}).get(key), value))
+    old_results = baseline.get("results", {})
+    regressions = []
+    print()
+    print("{0:<32} {1:>12} {2:>12} {3:>8}".format(
+        "case", "baseline", "current", "ratio"))
+    for name in sorted(results):
+        if name not in old_results:
+            continue
+        old = old_results[name]["seconds"]
+        new = results[name]["seconds"]
+        ratio = new / old
+        flag = ""
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+            flag = "  SLOWER"
+        elif ratio < 1 / (1 + tolerance):
+            flag = "  faster"
+        print("{0:<32} {1:>12} {2:>12} {3:>8.2f}{4}".format(name,
+            format_time(old), format_time(new), ratio, flag))
+    return regressions
+
+def format_time(seconds):
+    for unit, scale in [("sec", 1), ("msec", 1e3), ("usec", 1e6)]:
+        if seconds * scale >= 1:
+            return "{0:.3g} {1}".format(seconds * scale, unit)
+    return "{0:.3g} nsec".format(seconds * 1e9)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the WebHelpers2 public helpers.")
+    parser.add_argument("-o", "--output", help="write results to this file")
+    parser.add_argument("-b", "--baseline",
+        help="compare with results from this file")
+    parser.add_argument("-t", "--tolerance", type=float, default=0.25,
+        help="allowed slowdown as a fraction (default 0.25)")
+    parser.add_argument("-s", "--sizes", default="small,medium,huge",
+        help="comma-separated sizes to run (default all)")
+    parser.add_argument("-k", "--keyword",
+        help="only run cases whose name contains this")
+    args = parser.parse_args(argv)
+    sizes = set(args.sizes.split(","))
+    unknown = sizes.difference(x[0] for x in SIZES)
+    if unknown:
+        parser.error("unknown sizes: {0}".format(", ".join(sorted(unknown))))
+    results = run(sizes, args.keyword)
+    if args.output:
+        data = {"environment": environment(), "results": results}
+        with open(args.output, "w") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+            f.write("\n")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print()
+            print("{0} case(s) slower than the baseline by more than "
+                "{1:.0%}".format(len(regressions), args.tolerance))
+            return 1
+    return 0
+
+if __name__ == "__main__":  sys.exit(main())
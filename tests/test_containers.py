@@ -1,3 +1,5 @@
+import itertools
+
 import pytest
 from pytest import raises
 
@@ -35,6 +37,108 @@ class TestCounter(object):
         c = Counter.correlate(["A", "B", "A"])
         assert c.result["A"] == 2
         assert c.result["B"] == 1
+        assert c.total == 3
+
+    def test_update(self):
+        self.counter.update(x for x in ["bar", "baz"])
+        self.counter.update({"baz": 10})
+        assert self.counter.get_sorted_items() == [("bar", 2), ("baz", 2),
+            ("foo", 2)]
+        assert self.counter.total == 6
+
+    def test_popular_ties(self):
+        c = Counter.correlate("abracadabra")
+        assert c.get_popular() == [(5, "a"), (2, "b"), (2, "r"), (1, "c"),
+            (1, "d")]
+        assert c.get_popular(3) == [(5, "a"), (2, "b"), (2, "r")]
+
+    def test_merge(self):
+        other = Counter.correlate(["bar", "qux"])
+        assert self.counter.merge(other) is self.counter
+        assert self.counter.get_popular() == [(2, "bar"), (2, "foo"),
+            (1, "qux")]
+        assert self.counter.total == 5
+
+class TestHeavyHitters(object):
+    stream = list("abacabadabacabae") * 3
+
+    def check(self, hitters):
+        true_counts = Counter.correlate(self.stream).result
+        assert hitters.total == len(self.stream)
+        assert len(hitters.result) <= hitters.capacity
+        for item, count in true_counts.items():
+            low, high = hitters.get_bounds(item)
+            assert low <= count <= high
+            assert high - count <= float(hitters.total) / hitters.capacity
+
+    def test_one_at_a_time(self):
+        hitters = HeavyHitters(3)
+        for item in self.stream:
+            hitters(item)
+        self.check(hitters)
+        assert hitters.get_popular(2) == [(24, "a"), (12, "b")]
+
+    def test_update(self):
+        hitters = HeavyHitters(3)
+        hitters.chunk_size = 5
+        hitters.update(iter(self.stream))
+        self.check(hitters)
+        assert hitters.get_popular(1) == [(24, "a")]
+
+    def test_exact_below_capacity(self):
+        hitters = HeavyHitters.correlate(self.stream)
+        assert hitters.result == Counter.correlate(self.stream).result
+        assert hitters.get_bounds("z") == (0, 0)
+
+    def test_merge(self):
+        half = len(self.stream) // 2
+        hitters = HeavyHitters(3)
+        hitters.update(self.stream[:half])
+        other = HeavyHitters(3)
+        other.update(self.stream[half:])
+        assert hitters.merge(other) is hitters
+        self.check(hitters)
+        assert hitters.get_popular(1) == [(24, "a")]
+
+    def test_bad_capacity(self):
+        with raises(ValueError):
+            HeavyHitters(0)
+
+
+class TestLRUCache(object):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache["a"] = 1
+        cache["b"] = 2
+        assert cache.get("a") == 1
+        cache["c"] = 3
+        assert "b" not in cache
+        assert "a" in cache and "c" in cache
+        assert len(cache) == 2
+
+    def test_counters(self):
+        cache = LRUCache(10)
+        cache.get("x")
+        cache["x"] = 1
+        cache.get("x")
+        cache.get("x")
+        assert cache.stats() == {"hits": 2, "misses": 1, "size": 1,
+            "maxsize": 10}
+        cache.clear()
+        assert cache.stats() == {"hits": 0, "misses": 0, "size": 0,
+            "maxsize": 10}
+
+    def test_maxsize_zero(self):
+        cache = LRUCache(0)
+        cache["a"] = 1
+        assert cache.get("a", "default") == "default"
+
+    def test_unbounded(self):
+        cache = LRUCache(None)
+        for i in range(1000):
+            cache[i] = i
+        assert len(cache) == 1000
+
 
 @pytest.mark.parametrize('elements, expected_result', [
     (('a', 'b') * 2, ['a', 'b']),
@@ -43,6 +147,29 @@ class TestCounter(object):
 def test_unique(elements, expected_result):
     assert unique(elements) == expected_result
 
+class TestIterUnique(object):
+    def test_lazy(self):
+        it = iter_unique(itertools.count())
+        assert list(itertools.islice(it, 3)) == [0, 1, 2]
+
+    def test_key(self):
+        words = ["apple", "Avocado", "banana", "cherry", "Blueberry"]
+        result = iter_unique(words, key=lambda x: x[0].lower())
+        assert list(result) == ["apple", "banana", "cherry"]
+
+    def test_unhashable(self):
+        elements = [[1], {"a": 1}, [1], 2, {"a": 1}, 2, [2]]
+        assert list(iter_unique(elements)) == [[1], {"a": 1}, 2, [2]]
+
+    def test_window(self):
+        elements = [1, 2, 1, 3, 1, 4, 5, 1]
+        assert list(iter_unique(elements, maxsize=2)) == [1, 2, 3, 4, 5, 1]
+        assert list(iter_unique(elements, maxsize=0)) == elements
+
+    def test_unhashable_window(self):
+        elements = [[1], [2], [1], [3], [1]]
+        assert list(iter_unique(elements, maxsize=2)) == [[1], [2], [3], [1]]
+
 class TestDictFunctions(object):
     orig = {"A": 1, "B": 2, "C": 3}
 
@@ -193,6 +320,53 @@ class TestDistributeWithExtra(object):
         assert distribute(food_extra, 2, "V", "") == control
 
 
+class TestGridView(object):
+    @pytest.mark.parametrize("items", [food, food_extra, food[:1], []])
+    @pytest.mark.parametrize("columns", [1, 2, 3, 5])
+    @pytest.mark.parametrize("direction", ["H", "V"])
+    def test_same_as_distribute(self, items, columns, direction):
+        grid = GridView(items, columns, direction, "")
+        table = distribute(items, columns, direction, "")
+        assert grid.tolist() == table
+        assert len(grid) == len(table)
+        assert [list(col) for col in grid.columns()] == transpose(table)
+        assert grid.transpose().tolist() == transpose(table)
+        assert transpose(grid) == transpose(table)
+
+    def test_indexing(self):
+        grid = GridView(food_extra, 2, "V")
+        assert grid.shape == (5, 2)
+        assert grid[1][1] == "gelato"
+        assert grid[-1] == ["egg", None]
+        assert grid.cell(4, 0) == "egg"
+        assert grid[0][::-1] == ["fish", "apple"]
+        with raises(IndexError):
+            grid[5]
+        with raises(IndexError):
+            grid[0][2]
+
+    def test_cell_bounds(self):
+        grid = GridView(list("abcdefg"), 3, "H")
+        assert grid.cell(-1, 0) == "g"
+        assert grid.cell(2, 2) is None
+        with raises(IndexError):
+            grid.cell(0, 4)
+        with raises(IndexError):
+            grid.cell(3, 0)
+
+    def test_no_copy(self):
+        items = list(food)
+        grid = GridView(items, 3, "H")
+        items[0] = "avocado"
+        assert grid[0][0] == "avocado"
+
+    def test_errors(self):
+        with raises(ValueError):
+            GridView(food, 0, "H")
+        with raises(ValueError):
+            GridView(food, 2, "Sideways")
+
+
 class TestTranspose(object):
     def test1(self):
         a = transpose([["A", "B", "C"], ["D", "E", "F"]])
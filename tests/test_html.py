@@ -1,9 +1,13 @@
 from __future__ import unicode_literals
 
+import threading
+
 from pytest import raises
 import six
 
-from webhelpers2.html import literal, lit_sub, escape, HTML
+from webhelpers2.html import literal, lit_sub, escape, HTML, RenderProfile
+from webhelpers2.html.builder import HTMLBuilder
+from webhelpers2.html.tags import link_to
 
 
 class HTMLTestCase(object):
@@ -184,6 +188,47 @@ class TestHTMLBuilder(HTMLTestCase):
         a =  HTML.a("Foo", href="http://example.com/", class_="important")
         b = literal('<a class="important" href="http://example.com/">Foo</a>')
         self.check(a, b)
+
+    def test_getattr_case_insensitive(self):
+        self.check(HTML.TD("x"), "<td>x</td>")
+        self.check(HTML.Blink("x"), "<blink>x</blink>")
+
+    def test_getattr_bounded(self):
+        for i in range(1000):
+            self.check(getattr(HTML, "x{0}".format(i))(), "<x{0}></x{0}>".format(i))
+        assert len(HTML._tag_methods) <= HTML._tag_method_limit
+        assert "x1" not in vars(HTML)
+        assert "td" not in vars(HTML)
+
+    def test_getattr_cached(self):
+        assert HTML.TD is HTML.TD
+        assert HTML.blink is HTML.blink
+        # Keyed by the lowercase name.
+        assert HTML.Blink is HTML.BLINK is HTML.blink
+        assert "Blink" not in vars(HTML)
+
+    def test_getattr_threads(self):
+        builder = HTMLBuilder()
+        def lookup(start):
+            for i in range(start, start + 2000):
+                getattr(builder, "y{0}".format(i))
+        threads = [threading.Thread(target=lookup, args=(i * 2000,))
+            for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert 0 < len(builder._tag_methods) <= builder._tag_method_limit
+        assert not [k for k in vars(builder) if k.startswith("y")]
+
+    def test_subclass_tag_override(self):
+        class Builder(HTMLBuilder):
+            def tag(self, tag, *args, **kw):
+                kw.setdefault("class_", "x")
+                return HTMLBuilder.tag(self, tag, *args, **kw)
+        builder = Builder()
+        self.check(builder.td("a"), '<td class="x">a</td>')
+        self.check(builder.blink("a"), '<blink class="x">a</blink>')
     
     def test_cdata(self):
         a = HTML.cdata("Foo")
@@ -301,6 +346,26 @@ class TestAttributes(object):
         HTML.optimize_attrs(a)
         assert a == b
 
+    def test_render_attrs(self):
+        a = HTML.render_attrs({"value": 'A "B" <C>', "name": "q", "size": 5})
+        assert a == ' name="q" size="5" value="A &#34;B&#34; &lt;C&gt;"'
+        assert isinstance(a, literal)
+        assert HTML.render_attrs({}) == literal("")
+
+    def test_render_attrs_formatting(self):
+        class Value(object):
+            def __str__(self):
+                return "<str>"
+        a = HTML.render_attrs({"b": Value(), "a": literal("<i>")})
+        assert a == ' a="<i>" b="&lt;str&gt;"'
+
+    def test_render_attrs_order_cache(self):
+        limit = HTML._attr_order_limit
+        for i in range(limit + 10):
+            attrs = {"a": 1, "b{0}".format(i): 2}
+            assert HTML.render_attrs(attrs) == ' a="1" b{0}="2"'.format(i)
+        assert len(HTML._attr_orders) <= limit
+
 class TestBooleanAttributes(object):
     def test_boolean_true(self):
         a = {"defer": True, "disabled": "1", "multiple": 1, 
@@ -321,3 +386,48 @@ class TestBooleanAttributes(object):
         b = {"defer": "defer", "data-foo": "data-foo"}
         HTML.optimize_attrs(a, set(["data-foo"]))
         assert a == b
+
+
+class TestProfile(object):
+    def test_tags_and_helpers(self):
+        with HTML.profile() as profile:
+            HTML.br()
+            HTML.tag("br")
+            link_to("Home", "/")
+        stats = profile.to_dict()
+        assert sorted(stats["tags"]) == ["a", "br"]
+        assert stats["tags"]["br"]["calls"] == 2
+        assert stats["tags"]["br"]["bytes"] == 12
+        assert stats["helpers"]["link_to"]["calls"] == 1
+        assert stats["helpers"]["link_to"]["bytes"] == len('<a href="/">Home</a>')
+        assert stats["helpers"]["link_to"]["seconds"] >= 0
+
+    def test_disabled(self):
+        with HTML.profile() as profile:
+            pass
+        HTML.br()
+        assert profile.to_dict() == {"tags": {}, "helpers": {}}
+
+    def test_nested(self):
+        with HTML.profile() as outer:
+            HTML.br()
+            with HTML.profile() as inner:
+                HTML.hr()
+        assert sorted(outer.to_dict()["tags"]) == ["br", "hr"]
+        assert sorted(inner.to_dict()["tags"]) == ["hr"]
+
+    def test_shared_between_threads(self):
+        profile = RenderProfile()
+        def render():
+            with HTML.profile(profile):
+                for i in range(100):
+                    HTML.br()
+        threads = [threading.Thread(target=render) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        HTML.br()   # Not profiled: this thread has no active profile.
+        for thread in threads:
+            thread.join()
+        assert profile.to_dict()["tags"]["br"]["calls"] == 400
+        profile.clear()
+        assert profile.to_dict() == {"tags": {}, "helpers": {}}
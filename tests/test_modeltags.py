@@ -1,6 +1,9 @@
 from datetime import date
 import time
 
+import pytest
+
+import webhelpers2.html.tags
 from webhelpers2.html import HTML, literal
 from webhelpers2.html.tags import *
 
@@ -245,3 +248,128 @@ class TestModelTagsHelperWithoutObject(LanguageOptions):
     def test_date(self):
         assert self.m.date("newyears") == (
             '<input id="newyears" name="newyears" type="text" value="" />')
+
+
+class TestCompiledForm(LanguageOptions, HTMLTestCase):
+    def fields(self):
+        return [
+            "name",
+            ("hidden", "phone"),
+            ("checkbox", "fulltime"),
+            ("checkbox", "fired", {"label": "Fired"}),
+            ("password", "password"),
+            ("textarea", "longtext", {"rows": 5}),
+            ("radio", "favcolor", {"checked_value": "blue"}),
+            ("radio", "favcolor", {"checked_value": "red"}),
+            ("select", "lang", {"options": self.get_language_options()}),
+            ("date", "newyears"),
+            ("text", "nickname", {"default": "Bud"}),
+            ]
+
+    def render_uncompiled(self, m):
+        ret = []
+        for spec in self.fields():
+            if isinstance(spec, str):
+                spec = ("text", spec)
+            kw = dict(spec[2]) if len(spec) > 2 else {}
+            ret.append(getattr(m, spec[0])(spec[1], **kw))
+        return ret
+
+    def test_same_as_model_tags(self):
+        values = dict(TEST_VALUES, nickname="<Jimbo>")
+        for use_keys, record in [(False, Holder(values)), (True, values)]:
+            form = ModelTags(None, use_keys=use_keys).compile(self.fields())
+            m = ModelTags(record, use_keys=use_keys)
+            result = form.render(record)
+            assert result == self.render_uncompiled(m)
+            for field in result:
+                assert isinstance(field, literal)
+
+    def test_bytes_value(self, monkeypatch):
+        fields = ["name", ("hidden", "phone"), ("textarea", "longtext")]
+        record = {"name": b"Jim", "phone": b"<555>", "longtext": b"a&b"}
+        m = ModelTags(record, use_keys=True)
+        expected = [m.text("name"), m.hidden("phone"), m.textarea("longtext")]
+        form = ModelTags(None, use_keys=True).compile(fields)
+        assert form.render(record) == expected
+        # Escapers that reject bytes fall back to ``ModelTags``.
+        real_escape = webhelpers2.html.tags.escape
+        def escape(value):
+            if isinstance(value, bytes):
+                raise TypeError("bytes")
+            return real_escape(value)
+        monkeypatch.setattr(webhelpers2.html.tags, "escape", escape)
+        rendered = form.render(record)
+        monkeypatch.undo()
+        assert rendered == expected
+
+    def test_new_record(self):
+        form = ModelTags(None, id_format="person:{}").compile(self.fields())
+        m = ModelTags(None, id_format="person:{}")
+        assert form.render(None) == self.render_uncompiled(m)
+
+    def test_many_records(self):
+        form = ModelTags(None).compile(["name", ("select", "lang",
+            {"options": self.get_language_options()})])
+        for name, lang in [("Jim", "en"), ("Hans", "de"), ("Aki", "jp")]:
+            record = Holder({"name": name, "lang": lang})
+            assert form.render(record) == [
+                text("name", name),
+                select("lang", lang, self.get_language_options()),
+                ]
+
+    def test_unknown_field_type(self):
+        with pytest.raises(ValueError):
+            ModelTags(None).compile([("button", "go")])
+
+    def test_render_rows(self):
+        fields = [("text", "name", {"id": None}), ("checkbox", "active")]
+        records = (Holder({"name": name, "active": active})
+            for name, active in [("Jim", True), ("<Hans>", False)])
+        rows = ModelTags(None).render_rows(records, fields,
+            row_attrs={"class_": "person"}, cell_attrs={"class_": "field"})
+        assert not isinstance(rows, list)
+        first, second = rows
+        assert isinstance(first, literal)
+        assert first == literal('<tr class="person">'
+            '<td class="field"><input name="name" type="text" value="Jim" />'
+            '</td><td class="field"><input checked="checked" id="active" '
+            'name="active" type="checkbox" value="1" /></td></tr>')
+        assert second == literal('<tr class="person">'
+            '<td class="field"><input name="name" type="text" '
+            'value="&lt;Hans&gt;" /></td><td class="field"><input '
+            'id="active" name="active" type="checkbox" value="1" /></td></tr>')
+
+    def test_render_rows_name_format(self):
+        fields = ["name", ("radio", "lang", {"checked_value": "en"}),
+            ("select", "size", {"options": ["S", "M"]})]
+        records = [{"id": 7, "name": "Jim", "lang": "en", "size": "M"},
+            {"id": 9, "name": "<Hans>", "lang": "de", "size": "S"}]
+        for name_format, row_names in [
+            ("row-{index}.{name}", ["row-0.{0}", "row-1.{0}"]),
+            ("{name}[{record[id]}]", ["{0}[7]", "{0}[9]"]),
+            ]:
+            for id_format in [None, "person:{0}"]:
+                m = ModelTags(None, use_keys=True, id_format=id_format)
+                rows = list(m.render_rows(records, fields,
+                    name_format=name_format))
+                for row, record, row_name in zip(rows, records, row_names):
+                    # Same as rendering the renamed fields directly.
+                    renamed = dict((row_name.format(k), v)
+                        for k, v in record.items())
+                    r = ModelTags(renamed, use_keys=True, id_format=id_format)
+                    expected = "<tr><td>{0}</td><td>{1}</td><td>{2}</td></tr>"
+                    assert row == literal(expected.format(
+                        r.text(row_name.format("name")),
+                        r.radio(row_name.format("lang"), "en"),
+                        r.select(row_name.format("size"), ["S", "M"])))
+
+    def test_render_rows_name_format_ids(self):
+        rows = list(ModelTags(None).render_rows([Holder({"name": "a"})] * 2,
+            ["name"], name_format="name_{index}"))
+        assert 'id="name_0" name="name_0"' in rows[0]
+        assert 'id="name_1" name="name_1"' in rows[1]
+
+    def test_render_rows_no_fields(self):
+        rows = list(ModelTags(None).render_rows([{}], []))
+        assert rows == [literal("<tr></tr>")]
@@ -1,6 +1,10 @@
+import array
+import random
+
 import pytest
 from pytest import raises
 
+import webhelpers2.number
 from webhelpers2.number import *
 
 def eq(a, b, cutoff=0.001):
@@ -29,6 +33,34 @@ class TestPercentOf(object):
         assert percent_of(13, 26) == 50.0
 
 
+class TestPercentsOf(object):
+    def test_scalar_whole(self):
+        assert percents_of([5, 13], 26) == [percent_of(5, 26), 50.0]
+        assert percents_of(iter([1, 2]), 0) == [None, None]
+
+    def test_column_of_wholes(self):
+        result = percents_of([1, 0, 3], (x for x in [4, 0, 6]), zero=0.0)
+        assert result == [25.0, 0.0, 50.0]
+
+    def test_length_mismatch(self):
+        with raises(ValueError):
+            percents_of([1, 2], [3])
+
+    def test_format(self):
+        assert format_percents([12.345, None, 100], 2, "n/a") == [
+            "12.35%", "n/a", "100.00%"]
+        assert format_percents([50.0], 0) == ["50%"]
+
+    def test_numpy(self):
+        numpy = pytest.importorskip("numpy")
+        parts = numpy.array([1, 0, 3])
+        assert percents_of(parts, 6) == percents_of([1, 0, 3], 6)
+        assert percents_of(parts, numpy.array([4, 0, 6])) == [25.0, None, 50.0]
+        assert percents_of([1, 2], numpy.array([0, 0]), zero=0) == [0, 0]
+        with raises(ValueError):
+            percents_of(parts, numpy.array([1, 2]))
+
+
 class TestMean(object):
     def test1(self):
         assert mean([5, 10]) == 7.5
@@ -54,6 +86,69 @@ class TestMedian(object):
             median([])
         assert "median of empty collection" in str(exc_info.value)
 
+    def test_large(self):
+        # Large enough to be found by selection rather than sorting.
+        values = [(i * 7919) % 20001 for i in range(20001)]
+        assert median(values) == 10000
+        values.pop()
+        assert median(values) == mean(sorted(values)[9999:10001])
+
+
+class TestQuantiles(object):
+    values = [15, 20, 35, 40, 50]
+
+    def test_quantiles(self):
+        result = quantiles(self.values, [0, 0.25, 0.5, 0.9, 1])
+        assert result == [15, 20, 35, 46.0, 50]
+
+    def test_percentile(self):
+        assert percentile(self.values, 40) == 29.0
+        assert percentile(iter(self.values), 100) == 50
+
+    def test_large(self):
+        values = [(i * 7919) % 30000 for i in range(30000)]
+        low, mid, high = quantiles(values, [0.001, 0.5, 0.999])
+        eq(low, 29.999)
+        assert mid == 14999.5
+        eq(high, 29969.001)
+
+    def test_large_keeps_global_random_state(self):
+        values = [(i * 7919) % 30000 for i in range(30000)]
+        state = random.getstate()
+        quantiles(values, [0.5])
+        assert random.getstate() == state
+
+    def test_bad_probability(self):
+        with raises(ValueError):
+            quantiles(self.values, [1.5])
+        with raises(ValueError):
+            percentile(self.values, -1)
+
+    def test_empty(self):
+        with raises(ValueError):
+            quantiles([], [0.5])
+        with raises(ValueError):
+            quantiles([], [0.5], approximate=True)
+
+    def test_approximate_small(self):
+        # The estimate is exact for up to five numbers.
+        assert quantiles(self.values, [0.25, 0.9], approximate=True) == \
+            [20, 46.0]
+
+    def test_approximate(self):
+        values = [(i * 7919) % 10001 for i in range(10001)]
+        low, mid, high = quantiles(values, [0, 0.5, 0.99], approximate=True)
+        assert low == 0
+        eq(mid, 5000, cutoff=50)
+        eq(high, 9900, cutoff=50)
+
+    def test_p2_quantile(self):
+        estimator = P2Quantile(0.5)
+        estimator.update(range(1001))
+        assert estimator.count == 1001
+        eq(estimator.value, 500, cutoff=1)
+
+
 class TestStandardDeviation(object):
     
     temps_socal = [  # Temperatures in Southern California.
@@ -100,6 +195,154 @@ class TestStandardDeviation(object):
         a = standard_deviation(self.temps_mt, sample=False)
         eq(a, 43.2161878106906)
 
+    def test_iterator(self):
+        a = standard_deviation(iter(self.temps_mt))
+        eq(a, 45.1378360405574)
+
+
+class TestRunningStats(object):
+    numbers = [2, 4, 4, 4, 5, 5, 7, 9]
+
+    def test_stats(self):
+        stats = RunningStats(self.numbers)
+        assert stats.count == 8
+        assert stats.total == 40
+        assert stats.mean == 5.0
+        assert (stats.min, stats.max) == (2, 9)
+        assert stats.variance(sample=False) == 4.0
+        assert stats.stdev(sample=False) == 2.0
+        eq(stats.stdev(), 2.13808993529939)
+
+    def test_add_floats(self):
+        stats = RunningStats()
+        for x in self.numbers:
+            stats.add(x + 0.5)
+        assert stats.mean == 5.5
+        eq(stats.variance(sample=False), 4.0, cutoff=1e-12)
+        assert (stats.min, stats.max) == (2.5, 9.5)
+
+    def test_merge(self):
+        a = RunningStats(self.numbers[:3])
+        b = RunningStats(float(x) for x in self.numbers[3:])
+        assert a.merge(b) is a
+        assert a.count == 8
+        assert a.mean == 5.0
+        eq(a.variance(sample=False), 4.0, cutoff=1e-12)
+        assert (a.min, a.max) == (2, 9)
+
+    def test_merge_empty(self):
+        a = RunningStats().merge(RunningStats(self.numbers))
+        assert a.stdev(sample=False) == 2.0
+        assert a.merge(RunningStats()).count == 8
+
+    def test_sequence_same_as_iterator(self):
+        big = [1e9 + x for x in self.numbers]
+        for numbers in [self.numbers, big, [1, 2, 3.5, 4]]:
+            a = RunningStats(numbers)
+            b = RunningStats(iter(numbers))
+            assert (a.count, a.total, a.min, a.max) == \
+                (b.count, b.total, b.min, b.max)
+            eq(a.variance(), b.variance(), cutoff=1e-6)
+            eq(standard_deviation(numbers), a.stdev(), cutoff=1e-6)
+        eq(RunningStats(big).variance(sample=False), 4.0, cutoff=1e-6)
+
+    def test_ints_then_floats(self):
+        stats = RunningStats(iter(self.numbers[:4]))
+        stats.update(float(x) for x in self.numbers[4:])
+        stats.add(5)
+        eq(stats.variance(sample=False), RunningStats(
+            self.numbers + [5]).variance(sample=False), cutoff=1e-12)
+
+    def test_empty(self):
+        stats = RunningStats()
+        assert stats.min is None and stats.max is None
+        with raises(ValueError):
+            stats.mean
+        with raises(ValueError):
+            stats.variance()
+
+    def test_mean_of_generator(self):
+        assert mean(x for x in [5, 10]) == 7.5
+        with raises(ValueError):
+            mean(x for x in [])
+
+
+class TestHistogram(object):
+    numbers = [1, 2, 2, 3, 3, 3, 4, 10]
+
+    def test_bin_count(self):
+        assert histogram(self.numbers, 3) == ([6, 1, 1], [1.0, 4.0, 7.0, 10.0])
+        assert histogram(iter(self.numbers), 3)[0] == [6, 1, 1]
+
+    def test_range(self):
+        counts, edges = histogram(self.numbers, 2, (0, 4))
+        assert counts == [1, 6]
+        assert edges == [0.0, 2.0, 4.0]
+
+    def test_edges(self):
+        assert histogram(self.numbers, [2, 3, 10]) == ([2, 5], [2, 3, 10])
+
+    def test_one_value(self):
+        assert histogram([5, 5], 2) == ([0, 2], [4.5, 5.0, 5.5])
+
+    def test_empty(self):
+        assert histogram([], 2) == ([0, 0], [0.0, 0.5, 1.0])
+
+    def test_merge(self):
+        a = Histogram(4, (0, 4), self.numbers[:4])
+        b = Histogram(4, (0, 4))
+        for x in self.numbers[4:]:
+            b.add(x)
+        assert a.merge(b).counts == [0, 1, 2, 4]
+        assert a.outside == 1
+        with raises(ValueError):
+            a.merge(Histogram(2, (0, 4)))
+
+    @pytest.mark.parametrize("bins, span", [
+        (0, (0, 1)),
+        (2, None),
+        (2, (1, 0)),
+        ([1], None),
+        ([2, 1], None),
+        ])
+    def test_bad_bins(self, bins, span):
+        with raises(ValueError):
+            Histogram(bins, span)
+
+    def test_numpy(self):
+        numpy = pytest.importorskip("numpy")
+        a = numpy.array(self.numbers)
+        assert histogram(a, 3) == histogram(self.numbers, 3)
+        hist = Histogram(4, (0, 4), a)
+        assert hist.counts == [0, 1, 2, 4] and hist.outside == 1
+
+
+
+class TestArrayInput(object):
+    values = [2, 4, 4, 4, 5, 5, 7, 9, 11]
+
+    def check(self, a):
+        assert mean(a) == 51 / 9.0
+        assert median(a) == 5
+        eq(standard_deviation(a, sample=False), 8 / 3.0)
+        assert quantiles(a, [0, 0.5, 1]) == [2, 5, 11]
+
+    def test_array(self):
+        self.check(array.array("i", self.values))
+
+    def test_memoryview(self):
+        self.check(memoryview(array.array("d", self.values)))
+
+    def test_without_numpy(self, monkeypatch):
+        monkeypatch.setattr(webhelpers2.number, "_numpy", False)
+        self.check(array.array("i", self.values))
+
+    def test_numpy(self):
+        numpy = pytest.importorskip("numpy")
+        self.check(numpy.array(self.values))
+        assert standard_deviation(numpy.array([3.0])) == 0.0
+        with raises(ValueError):
+            mean(numpy.array([]))
 
 
 class TestFormatDataSize(object):
@@ -156,3 +399,29 @@ class TestFormatDataSize(object):
 
     def test_zero(self):
         assert format_bit_size(0) == "0 b"
+
+    def test_just_below_power(self):
+        assert format_byte_size(999999999999999) == "1.0 PB"
+        assert format_byte_size(999999999999) == "1000.0 GB"
+
+
+class TestFormatDataSizes(object):
+    sizes = [0, 1, 999, 1000, 1024, -1200, 12345678, 999999999999999,
+        123456789012345678901234567890, 0.5]
+
+    @pytest.mark.parametrize('binary', [False, True])
+    def test_same_as_scalar(self, binary):
+        expected = [format_data_size(x, "B", 2, binary) for x in self.sizes]
+        assert format_data_sizes(self.sizes, "B", 2, binary) == expected
+
+    def test_generator(self):
+        result = format_data_sizes((x * 1000 for x in range(3)), "bytes",
+            full_name=True)
+        assert result == ["0 bytes", "1.0 kilobytes", "2.0 kilobytes"]
+
+    def test_numpy(self):
+        numpy = pytest.importorskip("numpy")
+        sizes = self.sizes[:-2]
+        expected = [format_data_size(x, "B", 1, True) for x in sizes]
+        a = numpy.array(sizes, dtype=float)
+        assert format_data_sizes(a, "B", binary=True) == expected
@@ -104,6 +104,30 @@ class TestForm(HTMLTestCase):
             '<input name="foo" type="hidden" value="bar" />\n'
             '</div>\n')
 
+    def test_hidden_fields_multi_value(self):
+        class MultiDict(object):
+            def items(self):
+                return [("step", "1"), ("step", "2"), ("id", 3)]
+        tag = form("/submit", hidden_fields=MultiDict())
+        assert tag == literal(
+            '<form action="/submit" method="post">'
+            '<div style="display:none">\n'
+            '<input name="step" type="hidden" value="1" />\n'
+            '<input name="step" type="hidden" value="2" />\n'
+            '<input name="id" type="hidden" value="3" />\n'
+            '</div>\n')
+
+    def test_hidden_fields_same_as_hidden(self):
+        pairs = [("q", '<"A&B">'), ("empty", None), ("flag", True),
+            ("html", literal("<b>")), ("ratio", 0.5)]
+        tag = form("/submit", method="put", hidden_fields=pairs)
+        inputs = [hidden("_method", "put", id=None)]
+        inputs.extend(hidden(name, value, id=None) for name, value in pairs)
+        assert tag == literal(
+            '<form action="/submit" method="post">'
+            '<div style="display:none">\n') + literal("\n").join(inputs) + \
+            literal("\n</div>\n")
+
     def test_end_form(self):
         a = end_form() 
         b = literal("</form>")
@@ -229,6 +253,10 @@ class TestInputText(HTMLTestCase):
         b = '<input class="admin" id="title" name="title" type="text" value="Hello!" />'
         assert text( "title", "Hello!", class_= "admin") == b
 
+    def test_generated_id(self):
+        b = '<input id="rows-0first_name" name="rows-0.First Name" type="text" />'
+        assert text("rows-0.First Name") == b
+
 
 class TestInputOther(HTMLTestCase):
     def test_input_color(self):
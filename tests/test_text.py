@@ -155,6 +155,34 @@ class TestWrapParagraphsHelper(object):
         width = textwrap.TextWrapper(width=10)
         assert wrap_paragraphs(paragraph * 2, width) == wrapped * 2
 
+
+class TestIterWrap(object):
+    def test_iter_wrap_long_lines(self):
+        lines = iter(["short\n", "long long long\n", "short short\n"])
+        result = list(iter_wrap_long_lines(lines, 11))
+        assert result == ["short\n", "long long\nlong\n", "short short\n"]
+
+    def test_iter_wrap_paragraphs(self):
+        lines = iter(["short\n", "long long long\n", "more\n", "\n", "end"])
+        result = list(iter_wrap_paragraphs(lines, 11))
+        assert result == ["short\n", "long long\nlong more\n", "\n", "end"]
+
+    def test_iter_wrap_paragraphs_at_eof(self):
+        lines = iter(["long long long\n", "more"])
+        result = list(iter_wrap_paragraphs(lines, 11))
+        assert result == ["long long\nlong more\n"]
+
+    def test_wrap_many(self):
+        texts = ["word word word word\n", "word\n"]
+        wrapper = textwrap.TextWrapper(width=10)
+        result = list(wrap_many(texts, wrapper))
+        assert result == ["word word\nword word\n", "word\n"]
+
+    def test_wrap_many_long_lines(self):
+        texts = ["long long long\nmore\n"] * 2
+        result = list(wrap_many(texts, 11, paragraphs=False))
+        assert result == ["long long\nlong\nmore\n"] * 2
+
 class TestURLifyHelper(object):
     def test_urlify(self):
         s = "What is this? It is a car."
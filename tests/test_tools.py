@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+import io
+import mmap
 import re
 from string import Template
 
@@ -233,11 +235,64 @@ def test_js_obfuscate():
     (u'€', r"'\u20AC'"),
     ('"', r"'\x22'"),
     ("'", r"'\x27'"),
+    ("a\nb", r"'a\x0Ab'"),
     ])
 def test_js_quote_string(s, quoted):
     from webhelpers2.html.tools import js_quote_string
     assert js_quote_string(s) == quoted
 
+def test_js_quote_string_safe_chars():
+    from webhelpers2.html.tools import js_quote_string
+    assert js_quote_string(u"ab c\u20ac", "ab") == r"'ab\x20\x63\u20AC'"
+
+class TestMailToRenderer(object):
+    def test_same_as_mail_to(self):
+        render = MailToRenderer(encode="hex", replace_at="(at)")
+        for i in range(2):
+            assert render("me@domain.com", "My email") == mail_to(
+                "me@domain.com", "My email", encode="hex", replace_at="(at)")
+        assert render.stats()["hits"] == 1
+        assert render.stats()["misses"] == 1
+
+    def test_override_default(self):
+        render = MailToRenderer(encode="hex")
+        result = render("me@domain.com", encode="javascript")
+        assert result == mail_to("me@domain.com", encode="javascript")
+
+    def test_render_many(self):
+        render = MailToRenderer(maxsize=2)
+        addresses = ["a@example.com", ("b@example.com", "B")] * 2
+        result = render.render_many(addresses, class_="email")
+        control = [mail_to("a@example.com", class_="email"),
+            mail_to("b@example.com", "B", class_="email")] * 2
+        assert result == control
+        assert render.stats() == {"hits": 2, "misses": 2, "size": 2,
+            "maxsize": 2}
+
+    @pytest.mark.parametrize("first", [0, 1])
+    def test_literal_and_str_not_confused(self, first):
+        render = MailToRenderer()
+        names = [literal("<b>Boss</b>"), "<b>Boss</b>"]
+        for name in names[first:] + names[:first]:
+            assert render("a@x.com", name) == mail_to("a@x.com", name)
+        assert render.stats()["size"] == 2
+
+    def test_unhashable_args_not_cached(self):
+        render = MailToRenderer()
+        result = render("a@example.com", class_=["x", "y"])
+        assert result == mail_to("a@example.com", class_=["x", "y"])
+        assert render.stats()["size"] == 0
+
+
+def test_mail_to_hex_non_ascii():
+    result = mail_to(u"j\u00fcrgen@example.de", encode="hex")
+    control = (
+        '<a href="&#109;&#97;&#105;&#108;&#116;&#111;&#58;'
+        '%6a%fc%72%67%65%6e@%65%78%61%6d%70%6c%65.%64%65">'
+        '&#106;&#252;&#114;&#103;&#101;&#110;&#64;&#101;&#120;&#97;&#109;'
+        '&#112;&#108;&#101;&#46;&#100;&#101;</a>')
+    assert result == control
+
 
 class TestHighlightHelper(object):
     def test_highlight(self):
@@ -284,12 +339,131 @@ class TestHighlightHelper(object):
             highlight(literal("The <red> cat."), "at"))
 
 
+class TestHTMLToTextTables(object):
+    invoice = (
+        "<table>"
+        "<tr><th>Item</th><th>Qty</th></tr>"
+        "<tr><td>Apple</td><td>3</td></tr>"
+        "<tr><td>Banana split</td><td>12</td></tr>"
+        "</table>")
+
+    def test_grid(self):
+        control = (
+            "Item          Qty\n"
+            "------------  ---\n"
+            "Apple           3\n"
+            "Banana split   12\n\n")
+        assert html_to_text(self.invoice) == control
+
+    def test_text_column_left_aligned(self):
+        html = ("<table><tr><td>A</td><td>B</td></tr>"
+                "<tr><td>x</td><td>yes</td></tr></table>")
+        assert html_to_text(html) == "A  B\n-  ---\nx  yes\n\n"
+
+    def test_empty_cell(self):
+        html = ("<p>Intro</p><table><tr><td>A</td><td>B</td></tr>"
+                "<tr><td></td><td>b</td></tr></table>")
+        assert html_to_text(html) == "Intro\n\nA  B\n-  -\n   b\n\n"
+
+    def test_too_wide_falls_back(self):
+        control = (
+            "Item: Apple\n"
+            "Qty: 3\n"
+            "\n"
+            "Item: Banana split\n"
+            "Qty: 12\n\n\n")
+        assert html_to_text(self.invoice, width=16) == control
+
+    def test_nested_table_in_cell(self):
+        html = ("<table><tr><td>outer<table><tr><td>i1</td><td>i2</td></tr>"
+                "</table></td><td>5</td></tr></table><p>after</p>")
+        control = "outer i1 i2  5\n-----------  -\n\nafter\n\n"
+        assert html_to_text(html) == control
+
+    def test_cells_before_first_row(self):
+        html = ("<table><td>A</td><td>B</td>"
+                "<tr><td>x</td><td>y</td></tr></table>")
+        assert html_to_text(html) == "A  B\n-  -\nx  y\n\n"
+
+    def test_unclosed_cells(self):
+        html = "<table><tr><td>a<td>b<tr><td>c<td>d</table>"
+        assert html_to_text(html) == "a  b\n-  -\nc  d\n\n"
+        html = "<table><tr><th>h1<th>h2</tr><tr><td>1<td>2</tr></table>"
+        assert html_to_text(html) == "h1  h2\n--  --\n 1   2\n\n"
+
+    def test_table_in_list_item(self):
+        html = ("<ul><li><table><tr><th>h1</th><th>h2</th></tr>"
+                "<tr><td>1</td><td>2</td></tr></table></li></ul>")
+        control = "  * h1  h2\n    --  --\n     1   2\n\n"
+        assert html_to_text(html) == control
+        html = "<ol><li>a<li><table><tr><td>h<tr><td>1</table></ol>"
+        control = "  1) a\n\n  2) h\n     -\n     1\n\n"
+        assert html_to_text(html) == control
+        # Text before the table keeps its bullet.
+        html = "<ul><li>x<table><tr><td>h</td></tr></table></li></ul>"
+        assert html_to_text(html) == "  * x\n\n  h\n  -\n\n"
+
+    def test_table_measured_while_parsing(self):
+        p = render.HTMLRenderer()
+        p.feed(self.invoice)
+        p.close()
+        table = p.paragraphs[-1]
+        assert table.widths == [12, 3]
+        assert table.numeric == [False, True]
+        assert table.grid_width() == 17
+
+
+class TestHTMLToTextAlignment(object):
+    def test_centered(self):
+        html = '<h1>Title</h1><p align="center">mid</p>'
+        assert html_to_text(html, width=20) == "       TITLE\n\n        mid\n\n"
+
+
 class TestStripTagsHelper(object):
     def test_compare_strip_tags_to_sanitize(self):
         text = 'I <i>really</i> like <script language="javascript">NEFARIOUS CODE</script> steak!'
         assert strip_tags(text) == render.sanitize(text)
 
 
+class TestStreamInput(object):
+    html = (u'<p>Caf\u00e9 <i>one</i></p><!-- note -->\n'
+            u'<p>Line<br />two &amp; <b>three</b></p>\n') * 50
+
+    def test_iter_chunks_splits_multibyte(self):
+        f = io.BytesIO(self.html.encode("utf-8"))
+        chunks = list(render.iter_chunks(f, chunk_size=7))
+        assert len(chunks) > 1
+        assert "".join(chunks) == self.html
+
+    def test_strip_tags_binary_file(self, monkeypatch):
+        monkeypatch.setattr(render, "CHUNK_SIZE", 5)
+        f = io.BytesIO(self.html.encode("utf-8"))
+        assert strip_tags(f) == strip_tags(self.html)
+
+    def test_strip_tags_text_file(self):
+        f = io.StringIO(self.html)
+        assert strip_tags(f) == strip_tags(self.html)
+
+    def test_sanitize_binary_file(self):
+        f = io.BytesIO(self.html.encode("latin-1"))
+        assert sanitize(f, encoding="latin-1") == sanitize(self.html)
+
+    def test_html_to_text_path(self, tmp_path):
+        path = tmp_path / "page.html"
+        path.write_bytes(self.html.encode("utf-8"))
+        assert html_to_text(path) == html_to_text(self.html)
+
+    def test_html_to_text_mmap(self, tmp_path):
+        path = tmp_path / "page.html"
+        path.write_bytes(self.html.encode("utf-8"))
+        with path.open("rb") as f:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                assert html_to_text(m) == html_to_text(self.html)
+            finally:
+                m.close()
+
+
 class TestNL2BR(object):
     def test_nl2br(self):
         assert "A B<br />\nC D<br />\n<br />\nE F" == nl2br("A B\nC D\r\n\r\nE F")
@@ -364,3 +538,133 @@ class TestUpdateParams(object):
         control = "http://www.mau.de?foo=C&foo=D"
         result = update_params("http://www.mau.de?foo=A&foo=B", foo=["C", "D"])
         assert result == control
+
+
+class TestParamUpdater(object):
+    @pytest.mark.parametrize("url, params", [
+        ("foo", {"new1": "NEW1"}),
+        ("foo?p=1", {"p": "2"}),
+        ("foo?p=1", {"p": None}),
+        ("http://example.com/foo?new1=OLD1#myfrag", {"new1": "NEW1"}),
+        ("http://www.mau.de?foo=2", {"brrr": 3}),
+        ("http://www.mau.de?foo=A&foo=B", {"foo": ["C", "D"]}),
+        ("a?x=1&p=1&y=2", {"p": "2", "z": "new value"}),
+        ("a?x=1&p=1", {"p": [], "x": None}),
+        ("a?x=1#frag", {}),
+        ])
+    def test_same_as_update_params(self, url, params):
+        page_url = ParamUpdater(url)
+        expected = update_params(url, **params)
+        assert page_url(**params) == expected
+        # Second call uses the cached layout.
+        assert page_url(**params) == expected
+
+    def test_keyword_order(self):
+        page_url = ParamUpdater("/x?q=1")
+        assert page_url(a=1, b=2) == update_params("/x?q=1", a=1, b=2)
+        assert page_url(b=2, a=1) == update_params("/x?q=1", b=2, a=1)
+
+    def test_many_pages(self):
+        page_url = ParamUpdater("/list?sort=name&page=1&q=a+b#results")
+        for page in range(1, 5):
+            assert page_url(page=page) == \
+                "/list?sort=name&page={0}&q=a+b#results".format(page)
+
+
+class TestPaginateLinks(object):
+    def by_hand(self, url, page, page_count, pages, **attrs):
+        from webhelpers2.html.tags import link_to_if, ul
+        items = []
+        for i in pages:
+            if i is None:
+                items.append("...")
+            else:
+                href = update_params(url, page=i)
+                items.append(link_to_if(i != page, str(i), href))
+        return ul(items, **attrs)
+
+    @pytest.mark.parametrize("page, page_count, pages", [
+        (1, 2, [1, 2]),
+        (1, 20, [1, 2, 3, None, 20]),
+        (4, 20, [1, 2, 3, 4, 5, 6, None, 20]),
+        (10, 20, [1, None, 8, 9, 10, 11, 12, None, 20]),
+        (17, 20, [1, None, 15, 16, 17, 18, 19, 20]),
+        (20, 20, [1, None, 18, 19, 20]),
+        ])
+    def test_window(self, page, page_count, pages):
+        url = "/items?q=a+%26+b#list"
+        control = self.by_hand(url, page, page_count, pages, class_="pager")
+        result = paginate_links(url, page, page_count, class_="pager")
+        assert result == control
+
+    def test_single_page(self):
+        assert paginate_links("/items", 1, 1) == ""
+
+    def test_attrs(self):
+        result = paginate_links("/items", 2, 3, window=0, param="p",
+            gap="&", li_attrs={"class_": "item"},
+            link_attrs={"class_": "pg", "rel": "nofollow"})
+        control = (
+            '<ul>\n'
+            '<li class="item"><a class="pg" href="/items?p=1" rel="nofollow">1</a></li>\n'
+            '<li class="item">2</li>\n'
+            '<li class="item"><a class="pg" href="/items?p=3" rel="nofollow">3</a></li>\n'
+            '</ul>')
+        assert result == control
+
+    @pytest.mark.parametrize("page", [0, 10, 20])
+    def test_page_out_of_range(self, page):
+        with pytest.raises(ValueError):
+            paginate_links("/x", page, 9)
+
+    def test_nul_in_attrs(self):
+        result = paginate_links("/x", 1, 2, link_attrs={"title": "a\0b"})
+        assert result.count("<a ") == 1
+        assert 'href="/x?page=2"' in result
+        assert 'title="a\0b"' in result
+
+    def test_large_page_count(self):
+        result = paginate_links("/items", 5000, 10000, window=1)
+        assert result.count("<li>") == 7
+
+
+class TestBarChart(object):
+    def test_svg(self):
+        result = bar_chart([2, 0, 4], ["a & b", "", "c"], width=20, height=8,
+            bar_attrs={"fill": "red"}, class_="chart")
+        control = (
+            '<svg class="chart" height="8" viewBox="0 0 20 8" width="20" '
+            'xmlns="http://www.w3.org/2000/svg">\n'
+            '<rect fill="red" height="4" width="6" x="0" y="4"><title>a &amp; b</title></rect>\n'
+            '<rect fill="red" height="0" width="6" x="7" y="8"></rect>\n'
+            '<rect fill="red" height="8" width="6" x="14" y="0"><title>c</title></rect>\n'
+            '</svg>')
+        assert result == control
+
+    def test_html(self):
+        result = bar_chart([1, 3], ["x", None], width=10, height=6, gap=0,
+            svg=False)
+        control = (
+            '<span style="display:inline-block;height:6px;line-height:0">\n'
+            '<span style="display:inline-block;vertical-align:bottom;'
+            'width:5px;height:2px;margin-right:0px" title="x"></span>\n'
+            '<span style="display:inline-block;vertical-align:bottom;'
+            'width:5px;height:6px;margin-right:0px"></span>\n'
+            '</span>')
+        assert result == control
+
+    def test_empty_and_negative(self):
+        assert "<rect" not in bar_chart([])
+        assert bar_chart([-1, 0]).count('height="0"') == 2
+
+    @pytest.mark.parametrize("svg", [True, False])
+    def test_nul_in_bar_attrs(self, svg):
+        result = bar_chart([1, 2], ["a", "b"], svg=svg,
+            bar_attrs={"data_x": "\0"})
+        assert result.count('data-x="\0"') == 2
+        assert result.count("a") >= 1 and "b" in result
+
+    def test_label_count(self):
+        with pytest.raises(ValueError):
+            bar_chart([1, 2], ["a"])
+
@@ -6,8 +6,12 @@ package.
 """
 
 import collections
+import heapq
+import itertools
 import sys
+import threading
 from six import iteritems
+from six.moves import collections_abc
 from webhelpers2.misc import NotGiven
 
 class DumbObject(object):
@@ -54,10 +58,21 @@ class Counter(object):
 
         >>> counter.get_sorted_items()
         [('bar', 1), ('foo', 2)]
+
+    To count many items at once, or to combine the counts of several
+    counters (e.g., one per worker process)::
+
+        >>> counter.update(["bar", "baz", "bar"])
+        >>> counter.merge(Counter.correlate(["baz"])).get_popular()
+        [(3, 'bar'), (2, 'baz'), (2, 'foo')]
+        >>> counter.total
+        7
+
+    ``.result`` is a ``collections.Counter``.
     """
 
     def __init__(self):
-        self.result = collections.defaultdict(int)
+        self.result = collections.Counter()
         self.total = 0  # Number of times instance has been called.
 
     def __call__(self, item):
@@ -65,18 +80,43 @@ class Counter(object):
         self.result[item] += 1
         self.total += 1
 
+    def update(self, iterable):
+        """Register each item in an iterable.
+
+        This is the same as calling the counter for each item, but the
+        counting is done by ``collections.Counter``, in C on Python 3. An
+        iterator is consumed once without being copied.
+        """
+        # ``collections.Counter`` would take a mapping's values as counts,
+        # but we count its keys like any other iterable.
+        tally = collections.Counter(iter(iterable))
+        self.result.update(tally)
+        self.total += sum(tally.values())
+
+    def merge(self, other):
+        """Add the counts of another ``Counter``.
+
+        Update me in place and return me.
+        """
+        self.result.update(other.result)
+        self.total += other.total
+        return self
+
     def get_popular(self, max_items=None):
         """Return the results as as a list of ``(count, item)`` pairs, with the
         most frequently occurring items first.
 
         If ``max_items`` is provided, return no more than that many items.
+        Items with the same count are in item order. Only the top
+        ``max_items`` are kept while scanning the results, which takes
+        O(n log max_items) time rather than sorting them all.
         """
-        data = [(x[1], x[0]) for x in self.result.items()]
-        data.sort(key=lambda x: (-x[0], x[1]))
+        data = [(count, item) for item, count in iteritems(self.result)]
+        key = lambda x: (-x[0], x[1])
         if max_items:
-            return data[:max_items]
-        else:
-            return data
+            return heapq.nsmallest(max_items, data, key=key)
+        data.sort(key=key)
+        return data
 
     def get_sorted_items(self):
         """Return the result as a list of ``(item, count)`` pairs sorted by item.
@@ -89,12 +129,226 @@ class Counter(object):
         This is the same as adding each item individually.
         """
         counter = class_()
-        for elm in iterable:
-            counter(elm)
+        counter.update(iterable)
         return counter
     correlate = classmethod(correlate)
 
 
+class HeavyHitters(Counter):
+    """I count the most frequent items of a stream in bounded memory.
+
+    I have the same interface as ``Counter``, but I keep counts for at
+    most ``capacity`` items, so I can count referrers or user agents over
+    millions of distinct values. When a new item arrives and I'm full, the
+    item with the lowest count is dropped and the new one takes over its
+    count plus one (the Space-Saving algorithm)::
+
+        >>> hitters = HeavyHitters(2)
+        >>> hitters.update(["a", "b", "a", "c", "a"])
+        >>> hitters.get_popular()
+        [(3, 'a'), (2, 'c')]
+        >>> hitters.get_bounds("c")
+        (1, 2)
+
+    So the counts in ``.result`` and ``.get_popular()`` are estimates. They
+    are never too low, and they are too high by at most ``.total /
+    capacity``. Any item that occurs more often than that is sure to be
+    counted. ``.get_bounds(item)`` gives the range of an item's true
+    count. Memory grows with ``capacity`` and the error bound shrinks with
+    it.
+
+    Counters from several processes can be combined with ``.merge()``.
+    The result keeps the same guarantees, with the error bounds added.
+    """
+
+    # Number of items ``update()`` counts with ``collections.Counter``
+    # before merging them into the estimates.
+    chunk_size = 10000
+
+    def __init__(self, capacity=1000):
+        if capacity < 1:
+            raise ValueError("'capacity' must be >= 1")
+        Counter.__init__(self)
+        self.capacity = capacity
+        self._errors = {}   # Maximum overcount of each item.
+        # ``(count, serial, item)`` for each item. A count can be too low
+        # if the item was counted since it was pushed; ``_pop_min()``
+        # fixes that lazily. The serial number keeps items from being
+        # compared.
+        self._heap = []
+        self._serial = 0
+        self._untracked = 0   # Maximum count of an item not in ``result``.
+
+    def __call__(self, item):
+        """Register an item with the counter."""
+        self._add(item, 1, 0)
+        self.total += 1
+
+    def update(self, iterable):
+        """Register each item in an iterable.
+
+        The items are read in chunks of ``chunk_size``. Each chunk is
+        tallied with ``collections.Counter`` and added to the estimates
+        one distinct item at a time. The guarantees are the same as
+        adding the items one by one, although the estimates may differ.
+        """
+        it = iter(iterable)
+        while True:
+            chunk = list(itertools.islice(it, self.chunk_size))
+            if not chunk:
+                break
+            for item, count in iteritems(collections.Counter(chunk)):
+                self._add(item, count, 0)
+            self.total += len(chunk)
+
+    def merge(self, other):
+        """Add the counts of another ``HeavyHitters`` or ``Counter``.
+
+        Update me in place and return me. I keep my own capacity.
+        """
+        other_errors = getattr(other, "_errors", {})
+        other_untracked = getattr(other, "_untracked", 0)
+        counts = {}
+        errors = {}
+        for item in set(self.result).union(other.result):
+            counts[item] = (self.result.get(item, self._untracked) +
+                other.result.get(item, other_untracked))
+            errors[item] = (self._errors.get(item, self._untracked) +
+                other_errors.get(item, other_untracked))
+        untracked = self._untracked + other_untracked
+        if len(counts) > self.capacity:
+            ranked = sorted(counts, key=counts.__getitem__, reverse=True)
+            for item in ranked[self.capacity:]:
+                untracked = max(untracked, counts.pop(item))
+                del errors[item]
+        self.result = collections.Counter(counts)
+        self._errors = errors
+        self._untracked = untracked
+        self._heap = []
+        for item, count in iteritems(counts):
+            self._heap.append((count, self._serial, item))
+            self._serial += 1
+        heapq.heapify(self._heap)
+        self.total += other.total
+        return self
+
+    def get_bounds(self, item):
+        """Return the lowest and highest possible true count of an item."""
+        if item in self.result:
+            count = self.result[item]
+            return count - self._errors[item], count
+        return 0, self._untracked
+
+    def _add(self, item, count, error):
+        result = self.result
+        if item in result:
+            result[item] += count
+            return
+        if len(result) >= self.capacity:
+            floor = self._pop_min()
+            self._untracked = floor
+            count += floor
+            error += floor
+        result[item] = count
+        self._errors[item] = error
+        heapq.heappush(self._heap, (count, self._serial, item))
+        self._serial += 1
+
+    def _pop_min(self):
+        """Drop the item with the lowest count and return its count."""
+        heap = self._heap
+        result = self.result
+        while True:
+            count, serial, item = heap[0]
+            current = result[item]
+            if current == count:
+                heapq.heappop(heap)
+                del result[item]
+                del self._errors[item]
+                return count
+            # Counted since it was pushed: move it to its real place.
+            heapq.heapreplace(heap, (current, self._serial, item))
+            self._serial += 1
+
+
+class LRUCache(object):
+    """A bounded mapping that discards the least recently used items.
+
+    I'm meant for memoizing helpers whose arguments repeat heavily, such as
+    obfuscated e-mail links or form field IDs. I'm thread-safe, so I can
+    be shared at module level in a multithreaded application. Example::
+
+        >>> cache = LRUCache(2)
+        >>> cache["a"] = 1
+        >>> cache["b"] = 2
+        >>> cache.get("a")
+        1
+        >>> cache["c"] = 3   # Discards "b", the least recently used.
+        >>> cache.get("b") is None
+        True
+        >>> sorted(cache.stats().items())
+        [('hits', 1), ('maxsize', 2), ('misses', 1), ('size', 2)]
+
+    ``maxsize`` is the maximum number of items. If ``None``, the cache grows
+    without bound. If 0, nothing is stored.
+
+    The ``.hits`` and ``.misses`` attributes count the lookups made with
+    ``.get()``.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __setitem__(self, key, value):
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            if self.maxsize is not None and len(self._data) > self.maxsize:
+                self._data.popitem(False)
+
+    def get(self, key, default=None):
+        """Return the value for ``key`` and mark it as recently used.
+
+        Return ``default`` if the key is not in the cache.
+        """
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def clear(self):
+        """Delete all items and reset the counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """Return a dict of the counters, current size and maximum size."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            }
+
+
 def unique(it):
     """Return a list of unique elements in the iterable, preserving the order.
 
@@ -102,6 +356,8 @@ def unique(it):
 
         >>> unique([None, "spam", 2, "spam", "A", "spam", "spam", "eggs", "spam"])
         [None, 'spam', 2, 'A', 'eggs']
+
+    See ``iter_unique()`` for a lazy version with more options.
     """
     seen = set()
     ret = []
@@ -111,6 +367,57 @@ def unique(it):
             seen.add(elm)
     return ret
 
+def iter_unique(it, key=None, maxsize=None):
+    """Yield the unique elements of an iterable lazily, preserving the order.
+
+    ``key``: a function of one argument. Elements are duplicates if their
+    keys are equal. By default the elements are compared themselves.
+
+    ``maxsize``: if not None, only remember the keys of the last
+    ``maxsize`` distinct elements, in an ``LRUCache``. A repeat is still
+    skipped if its key was seen recently, so this de-duplicates an endless
+    stream in bounded memory, but an element that returns after enough
+    others may be yielded again.
+
+    Usage::
+
+        >>> list(iter_unique(["a", "B", "b", "A", "c"], key=str.lower))
+        ['a', 'B', 'c']
+        >>> list(iter_unique([1, 2, 1, 3, 4, 1], maxsize=2))
+        [1, 2, 3, 4, 1]
+
+    Unhashable keys such as lists are compared by equality with the other
+    unhashable keys seen (the last ``maxsize`` of them if it's given),
+    which takes time proportional to their number.
+    """
+    unhashable = collections.deque(maxlen=maxsize)
+    if maxsize is None:
+        seen = set()
+        for elm in it:
+            k = elm if key is None else key(elm)
+            try:
+                if k in seen:
+                    continue
+                seen.add(k)
+            except TypeError:
+                if k in unhashable:
+                    continue
+                unhashable.append(k)
+            yield elm
+    else:
+        seen = LRUCache(maxsize)
+        for elm in it:
+            k = elm if key is None else key(elm)
+            try:
+                if seen.get(k):
+                    continue
+                seen[k] = True
+            except TypeError:
+                if k in unhashable:
+                    continue
+                unhashable.append(k)
+            yield elm
+
 def copy_keys(dic, *keys):
     """Return a copy of the dict with only the specified items present.  
     
@@ -339,6 +646,9 @@ def distribute(lis, columns, direction, fill=None):
         banana    egg       honey     .
         carrot    fish                .
 
+    To display a long list without copying it into a table, use
+    ``GridView`` instead.
+
     Alternatives to this function include a NumPy matrix of objects.
 
     """
@@ -370,6 +680,158 @@ def distribute(lis, columns, direction, fill=None):
     else:
         raise ValueError("arg ``direction`` must start with 'H' or 'V'")
 
+class GridView(collections_abc.Sequence):
+    """A lazy version of ``distribute()``.
+
+    I have the same arguments as ``distribute()`` and look like its result,
+    a list of rows, but I don't copy the list. ``grid[row][col]`` is looked
+    up in the original list when it's used, by index arithmetic, so I take
+    constant memory however large the list is::
+
+        >>> food = ["apple", "banana", "carrot", "daikon", "egg", "fish", "gelato", "honey"]
+        >>> grid = GridView(food, 3, "V", "")
+        >>> len(grid), grid[0][1], grid[2][2]
+        (3, 'daikon', '')
+        >>> [list(row) for row in grid] == distribute(food, 3, "V", "")
+        True
+        >>> [list(col) for col in grid.columns()][0]
+        ['apple', 'banana', 'carrot']
+
+    Rows and columns are read-only sequence views. ``.tolist()`` returns the
+    same list of lists as ``distribute()``. ``.transpose()`` returns a view
+    with the rows and columns swapped, without copying; ``transpose(grid)``
+    also works and returns lists as usual.
+
+    The list must be a sequence that supports indexing, and should not
+    change while the view is used.
+    """
+
+    def __init__(self, lis, columns, direction, fill=None):
+        if columns < 1:
+            raise ValueError("arg 'columns' must be >= 1")
+        dir = direction[0].upper()
+        rows, remainder = divmod(len(lis), columns)
+        if remainder:
+            rows += 1
+        if dir == "H":
+            strides = (columns, 1)
+        elif dir == "V":
+            strides = (1, rows)
+        else:
+            raise ValueError("arg ``direction`` must start with 'H' or 'V'")
+        if not rows:
+            columns = 0   # Like ``transpose(distribute([], ...))``.
+        self._init(lis, (rows, columns), strides, fill)
+
+    def _init(self, lis, shape, strides, fill):
+        self.lis = lis
+        self.fill = fill
+        self.shape = shape       # ``(rows, columns)``
+        self._strides = strides  # Index steps per row and per column.
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return _GridLine(self, _check_index(index, self.shape[0]), 0)
+
+    def __iter__(self):
+        return self.rows()
+
+    def __repr__(self):
+        return "<GridView rows={0} columns={1}>".format(*self.shape)
+
+    def cell(self, row, col):
+        """Return the value at ``row`` and ``col``.
+
+        Negative indexes count from the end, as for a list. Raise
+        IndexError if either is out of range.
+        """
+        row = _check_index(row, self.shape[0])
+        col = _check_index(col, self.shape[1])
+        i = row * self._strides[0] + col * self._strides[1]
+        if i < len(self.lis):
+            return self.lis[i]
+        return self.fill
+
+    def rows(self):
+        """Iterate over the rows as sequence views."""
+        for i in range(self.shape[0]):
+            yield _GridLine(self, i, 0)
+
+    def columns(self):
+        """Iterate over the columns as sequence views."""
+        for i in range(self.shape[1]):
+            yield _GridLine(self, i, 1)
+
+    def tolist(self):
+        """Return a list of lists, the same as ``distribute()``."""
+        return [list(row) for row in self.rows()]
+
+    def transpose(self):
+        """Return a view with rows and columns swapped."""
+        view = GridView.__new__(GridView)
+        view._init(self.lis, self.shape[::-1], self._strides[::-1], self.fill)
+        return view
+
+
+class _GridLine(collections_abc.Sequence):
+    """A row (``axis`` 0) or column (``axis`` 1) of a ``GridView``."""
+
+    def __init__(self, grid, index, axis):
+        self.grid = grid
+        self.index = index
+        self.axis = axis
+
+    def __len__(self):
+        return self.grid.shape[1 - self.axis]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = _check_index(index, len(self))
+        if self.axis == 0:
+            return self.grid.cell(self.index, index)
+        return self.grid.cell(index, self.index)
+
+    def __iter__(self):
+        grid = self.grid
+        lis = grid.lis
+        size = len(lis)
+        step = grid._strides[1 - self.axis]
+        start = self.index * grid._strides[self.axis]
+        for k in range(len(self)):
+            i = start + k * step
+            yield lis[i] if i < size else grid.fill
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple, _GridLine)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "<grid {0} {1}: {2!r}>".format(("row", "column")[self.axis],
+            self.index, list(self))
+
+
+def _check_index(index, length):
+    """Return ``index`` made non-negative, or raise IndexError."""
+    if index < 0:
+        index += length
+    if not 0 <= index < length:
+        raise IndexError("grid index out of range")
+    return index
+
 def transpose(array):
     """Turn a list of lists sideways, making columns into rows and vice-versa.
 
@@ -5,6 +5,7 @@ from __future__ import unicode_literals
 import re
 
 from webhelpers2.html import HTML, literal, lit_sub, escape
+from webhelpers2.html.builder import profiled
 
 __all__ = ["auto_link"]
 
@@ -30,6 +31,7 @@ AUTO_LINK_RE = re.compile(r"""
                            """, re.X)
 
 
+@profiled
 def auto_link(text, link="all", **href_attrs):
     """
     Turn all urls and email addresses into clickable links.
@@ -12,6 +12,7 @@
 # - Change code when run as a script.
 # - Don't convert Unicode to text.
 # - Drop textwrap backport.  (WebHelpers doesn't support Python < 2.3.)
+# - Lay out tables as aligned columns; recognize <th> cells.
 
 
 ##########################################################################
@@ -41,6 +42,8 @@
 """
 
 from __future__ import print_function
+import codecs
+import io
 import re
 import textwrap
 
@@ -48,10 +51,13 @@ import six
 from six.moves import html_parser
 from six.moves import html_entities
 
+from webhelpers2.html.builder import profiled
+
 __all__ = ["html_to_text", "sanitize"]
 
 #### Public
-def html_to_text(html, width=70):
+@profiled
+def html_to_text(html, width=70, encoding="utf-8"):
     """Render HTML as formatted text, like lynx's "print" function.
 
     Paragraphs are collected and wrapped at the specified width, default 70.
@@ -64,25 +70,35 @@ def html_to_text(html, width=70):
     The output usually ends with two newlines.  If the input ends with a close
     tag plus any whitespace, the output ends with four newlines.  This is
     probably a bug.
+
+    ``html`` may also be an open file (text or binary), an ``mmap``, or a
+    path object such as ``pathlib.Path``. These are read and parsed in
+    chunks, so the whole document is never held in memory as a string.
+    Binary input is decoded with ``encoding``. A plain string is always
+    treated as HTML, never as a filename.
     """
     context = Context()
     context.width = width
     context.indent = 0
     p = HTMLRenderer()
-    p.feed(html)
+    feed(p, html, encoding)
     p.close()
     paras = [para.to_text(context)
              for para in p.paragraphs
              if para]
     return "".join(paras)
 
-def sanitize(html):
+@profiled
+def sanitize(html, encoding="utf-8"):
     """Strip all HTML tags but leave their content.
 
     Use this to strip any potentially malicious tags from user input.
 
     HTML entities are left as-is.
 
+    ``html`` may also be a file, ``mmap``, or path object, as for
+    ``html_to_text()``.
+
     Usage::
 
         >>> sanitize(u'I <i>really</i> like steak!')
@@ -91,11 +107,57 @@ def sanitize(html):
         u'I really like NEFARIOUS CODE steak!'
     """
     p = HTMLSanitizer()
-    p.feed(html)
+    feed(p, html, encoding)
     p.close()
     return "".join(p.output_chunks)
 
 #### Private (though safe to use)
+CHUNK_SIZE = 64 * 1024
+
+def feed(parser, source, encoding="utf-8"):
+    """Feed HTML from a string, file, ``mmap`` or path into a parser."""
+    if is_stream_source(source):
+        for chunk in iter_chunks(source, encoding):
+            parser.feed(chunk)
+    else:
+        parser.feed(source)
+
+def is_stream_source(source):
+    """Is ``source`` something to read rather than an HTML string?"""
+    if isinstance(source, six.string_types):
+        return False
+    return hasattr(source, "read") or hasattr(source, "__fspath__")
+
+def iter_chunks(source, encoding="utf-8", chunk_size=CHUNK_SIZE):
+    """Yield decoded text chunks from a file, ``mmap`` or path.
+
+    Bytes are decoded incrementally, so a multibyte character split across
+    a chunk boundary is decoded correctly. Paths are opened in binary mode
+    and closed afterward.
+    """
+    if hasattr(source, "read"):
+        for chunk in _decode_chunks(source, encoding, chunk_size):
+            yield chunk
+    else:
+        with io.open(source.__fspath__(), "rb") as f:
+            for chunk in _decode_chunks(f, encoding, chunk_size):
+                yield chunk
+
+def _decode_chunks(f, encoding, chunk_size):
+    decoder = codecs.getincrementaldecoder(encoding)()
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        if isinstance(chunk, six.binary_type):
+            chunk = decoder.decode(chunk)
+            if not chunk:
+                continue
+        yield chunk
+    tail = decoder.decode(b"", True)
+    if tail:
+        yield tail
+
 class HTMLRenderer(html_parser.HTMLParser):
 
     block_tags = 'p div blockquote h1 h2 h3 h4 h5 h6 ul ol'.split()
@@ -107,8 +169,10 @@ class HTMLRenderer(html_parser.HTMLParser):
         self.last_href = None
         self.href_content = None
         self.in_table = None
-        self.cell_content = None
+        self.cell_start = None
+        self.table_stack = []
         self.list_type = []
+        self.bullet = None
 
     def handle_starttag(self, tag, attrs):
         tag = tag.lower()
@@ -129,19 +193,23 @@ class HTMLRenderer(html_parser.HTMLParser):
             if alt:
                 self.handle_data(alt)
         if tag == 'table':
-            # @@: This is a hacky way of dealing with nested
-            # tables.  Basically the tables are crudely flattened,
-            # and we keep track of how many <table>'s we see based
-            # on the table.depth attribute (so we can later remove
-            # the table when sufficient </table>'s have been seen)
-            if self.in_table:
-                self.in_table.depth += 1
-            else:
-                self.in_table = Table()
-        if tag == 'tr':
+            # Save the enclosing table and cell, so that a nested table
+            # ends up in the content of the cell it's in.  A list item's
+            # bullet goes on the table's first line.
+            prefix = self.pop_bullet()
+            self.end_para(None)
+            self.table_stack.append((self.in_table, self.cell_start))
+            self.in_table = Table()
+            self.in_table.prefix = prefix
+            self.cell_start = None
+        if tag == 'tr' and self.in_table is not None:
+            # End tags of cells are optional.
+            self.close_cell()
             self.in_table.add_row()
-        if tag == 'td':
-            self.cell_content = []
+        if tag in ('td', 'th'):
+            self.close_cell()
+            self.end_para(None)
+            self.cell_start = len(self.paragraphs)
         if tag == 'ul':
             self.paragraphs.append(Indenter(2))
             self.list_type.append('ul')
@@ -155,6 +223,7 @@ class HTMLRenderer(html_parser.HTMLParser):
             else:
                 self.handle_data('%i) ' % self.list_type[-1])
                 self.list_type[-1] += 1
+            self.bullet = (self.in_paragraph, len(self.in_paragraph.text) - 1)
 
     def handle_endtag(self, tag):
         if tag in self.block_tags:
@@ -168,16 +237,16 @@ class HTMLRenderer(html_parser.HTMLParser):
             if content and self.last_href and content != self.last_href:
                 self.handle_data(' <%s>' % self.last_href)
             self.last_href = None
-        if tag == 'table':
-            self.paragraphs.append(self.in_table)
-            self.in_table.depth -= 1
-            if not self.in_table.depth:
-                self.in_table = None
-        if tag == 'td':
-            self.end_para(tag)
-            if self.paragraphs:
-                self.in_table.add_cell(self.paragraphs[-1])
-                self.paragraphs.pop()
+        if tag == 'tr':
+            self.close_cell()
+        if tag == 'table' and self.in_table is not None:
+            self.close_cell()
+            self.end_para(None)
+            table = self.in_table
+            self.in_table, self.cell_start = self.table_stack.pop()
+            self.paragraphs.append(table)
+        if tag in ('td', 'th'):
+            self.close_cell()
         if tag == 'ul' or tag == 'ol':
             self.paragraphs.append(Indenter(-2))
             self.list_type.pop()
@@ -223,6 +292,55 @@ class HTMLRenderer(html_parser.HTMLParser):
             self.paragraphs.append(self.in_paragraph)
         self.in_paragraph = None
 
+    def close_cell(self):
+        """Add the open cell, if any, to the current table."""
+        if self.in_table is None or self.cell_start is None:
+            return
+        self.end_para(None)
+        # Take the cell's content off the paragraph stream.  Several
+        # paragraphs are joined with line breaks, as are the rows of a
+        # nested table; an empty cell still occupies a column.
+        chunks = self.paragraphs[self.cell_start:]
+        del self.paragraphs[self.cell_start:]
+        cell = Paragraph('p', [])
+        for chunk in chunks:
+            if isinstance(chunk, Paragraph):
+                if cell.text:
+                    cell.add_tag('<br>')
+                cell.text.extend(chunk.text)
+            elif isinstance(chunk, Table):
+                for texts in chunk.texts:
+                    line = ' '.join([t for t in texts if t])
+                    if line:
+                        if cell.text:
+                            cell.add_tag('<br>')
+                        cell.add_text(line)
+        self.in_table.add_cell(cell)
+        self.cell_start = None
+
+    def pop_bullet(self):
+        """Take a list item's bullet off the open paragraph and return it.
+
+        Return '' unless the bullet is all the paragraph has (after its
+        last line break), apart from whitespace.
+        """
+        para = self.in_paragraph
+        if para is None or self.bullet is None or self.bullet[0] is not para:
+            return ''
+        index = self.bullet[1]
+        text = para.text
+        for item in text[index + 1:]:
+            if isinstance(item, list) or item.strip():
+                return ''
+        bullet = text[index]
+        del text[index:]
+        if text and text[-1] == ['<br>']:
+            text.pop()
+        if not text:
+            self.in_paragraph = None
+        self.bullet = None
+        return bullet
+
     def add_br(self, tag, attrs):
         if not self.in_paragraph:
             self.start_para(None, None)
@@ -290,7 +408,7 @@ class Paragraph:
             return [' '*(width-len(line))+line
                      for line in lines]
         elif self.alignment() == 'center':
-            return [' '*((width-len(line))/2)+line
+            return [' '*((width-len(line))//2)+line
                     for line in lines]
         elif self.alignment() == 'left':
             return lines
@@ -327,36 +445,114 @@ class Paragraph:
 
 class Table:
 
+    """A table collected from <tr> and <td>/<th> tags.
+
+    Cells are measured as they're added, so ``to_text`` can lay out the
+    grid without another pass over the cells.  The first row is the header.
+    If the grid doesn't fit within the context width, fall back to the
+    "header: value" format.
+    """
+
+    column_sep = '  '
+    rule_char = '-'
+
     def __init__(self):
         self.rows = []
+        self.texts = []
+        self.widths = []
+        self.numeric = []
         self.row_num = 0
-        self.depth = 1
+        # Text such as a list bullet to put before the first line.
+        self.prefix = ''
 
     def add_row(self):
         self.row_num += 1
         self.rows.append([])
+        self.texts.append([])
 
     def add_cell(self, value):
-        self.rows[-1].append(value)
+        if not self.rows:
+            self.add_row()
+        row = self.rows[-1]
+        col = len(row)
+        row.append(value)
+        text = ' '.join(value.make_lines())
+        self.texts[-1].append(text)
+        if col == len(self.widths):
+            self.widths.append(0)
+            self.numeric.append(True)
+        if len(text) > self.widths[col]:
+            self.widths[col] = len(text)
+        if len(self.rows) > 1 and text and not numeric_rx.match(text):
+            # Header cells don't affect a column's alignment.
+            self.numeric[col] = False
 
     def __nonzero__(self):
         return not not self.rows
 
+    __bool__ = __nonzero__
+
     def to_text(self, context):
-        if self.rows and not self.rows[-1]:
+        rows = self.rows
+        texts = self.texts
+        if rows and not rows[-1]:
             # Get rid of blank last line
-            self.rows.pop()
-        if not self.rows:
+            rows = rows[:-1]
+            texts = texts[:-1]
+        if not rows:
             return ''
-        headers = [p.to_text(context).strip() for p in self.rows.pop(0)]
+        if self.grid_width(context.indent) <= context.width:
+            return self.to_grid(texts, context)
+        return self.to_records(rows, context)
+
+    def grid_width(self, indent=0):
+        """Return the width of the widest possible grid line."""
+        if not self.widths:
+            return indent + len(self.prefix)
+        seps = len(self.column_sep) * (len(self.widths) - 1)
+        return indent + len(self.prefix) + sum(self.widths) + seps
+
+    def to_grid(self, texts, context):
+        """Render the table as aligned columns with a rule under the header.
+        """
+        indent = ' ' * (context.indent + len(self.prefix))
+        first_indent = ' ' * context.indent + self.prefix
+        sep = self.column_sep
+        widths = self.widths
+        numeric = self.numeric
+        ncols = len(widths)
+        rule = sep.join([self.rule_char * w for w in widths])
+        lines = []
+        for i, row in enumerate(texts):
+            cells = []
+            for col in range(ncols):
+                text = row[col] if col < len(row) else ''
+                if numeric[col] and i > 0:
+                    cells.append(text.rjust(widths[col]))
+                else:
+                    cells.append(text.ljust(widths[col]))
+            start = first_indent if i == 0 else indent
+            lines.append((start + sep.join(cells)).rstrip())
+            if i == 0:
+                lines.append(indent + rule)
+        return '\n'.join(lines) + '\n\n'
+
+    def to_records(self, rows, context):
+        """Render each row as a block of "header: value" lines.
+
+        This is the fallback for tables too wide for the context width.
+        """
+        headers = [p.to_text(context).strip() for p in rows[0]]
         context.indent += 4
         lines = []
-        for row in self.rows:
+        for row in rows[1:]:
             for header, cell in zip(headers, row):
                 cell_text = cell.to_text(context).strip()
                 lines.append('%s: %s' % (header, cell_text))
             lines.append('')
         context.indent -= 4
+        if lines:
+            lines[0] = self.prefix + lines[0]
         return '\n'.join(lines) + '\n\n'
 
 class Indenter:
@@ -381,6 +577,8 @@ class HTMLSanitizer(html_parser.HTMLParser):
         self.output_chunks.append(data)
 
 
+numeric_rx = re.compile(r'^[-+(]?\$?[\d,]*\.?\d+[%)]?$')
+
 def normalize(text):
     text = re.sub(r'\s+', ' ', text)
     # nbsp:
@@ -4,9 +4,13 @@
 
 from __future__ import unicode_literals
 import collections
+import contextlib
 import functools
 import re
+import threading
+from timeit import default_timer
 
+import markupsafe
 import six
 from six.moves.urllib.parse import quote as url_escape
 
@@ -16,7 +20,8 @@ escape = literal.escape
 NL = literal("\n")
 BR = literal("<br />\n")
 
-__all__ = ["HTML", "escape", "literal", "url_escape", "lit_sub"]
+__all__ = ["HTML", "escape", "literal", "url_escape", "lit_sub",
+    "RenderProfile"]
 
 
 class HTMLBuilder(object):
@@ -113,6 +118,32 @@ class HTMLBuilder(object):
     _cdata_tag = literal("<![CDATA["), literal("]]>")
     _comment_tag = literal("<!-- "), literal(" -->")
 
+    # The sorted key order for each set of attribute names ``render_attrs``
+    # has seen, shared by all instances. It's emptied when it reaches
+    # ``_attr_order_limit`` entries so that it stays bounded.
+    _attr_orders = {}
+    _attr_order_limit = 1024
+
+    # How many other tag names ``__getattr__`` caches per instance before
+    # discarding them.
+    _tag_method_limit = 256
+
+    # Attribute value types whose escaped ``str()`` is exactly what
+    # ``literal.format`` would produce, so they can skip the formatter.
+    _plain_attr_types = frozenset(
+        (six.text_type, literal, float, bool) + six.integer_types)
+
+    def __init__(self):
+        # Methods for other tag names, keyed by lowercase name. Lookups
+        # don't lock; insertions and resets do, so the size stays bounded.
+        self._tag_methods = {}
+        self._tag_methods_lock = threading.Lock()
+        if type(self).tag is not HTMLBuilder.tag:
+            # The HTML 5 tag methods call ``_tag()`` directly. Route them
+            # through the subclass's ``tag()`` instead.
+            for name in html5_tags:
+                setattr(self, name, functools.partial(self.tag, name))
+
     def __call__(self, *args, **kw):
 
         """Escape the string args, concatenate them, and return a literal.
@@ -243,6 +274,11 @@ class HTMLBuilder(object):
         literal(u'</div>')
         """
 
+        if _profiling.active:
+            return _profiling.measure("tags", tag, self._tag, (tag, args, kw))
+        return self._tag(tag, args, kw)
+
+    def _tag(self, tag, args, kw):
         if "c" in kw:
             if args:
                 raise TypeError(
@@ -273,18 +309,72 @@ class HTMLBuilder(object):
                 chunks.append(substr.format(tag))
         return self(*chunks, nl=nl)
 
+    def profile(self, profile=None):
+
+        """Profile the tags and helpers rendered in a ``with`` block.
+
+        Return a context manager. Within the block, every ``tag()`` call
+        and every call to a helper in ``webhelpers2.html`` (``select``,
+        ``link_to``, ``auto_link``, etc) in the current thread is counted
+        and timed in a ``RenderProfile``, which the ``with`` statement
+        yields::
+
+            with HTML.profile() as profile:
+                page = render_template(...)
+            metrics.send(profile.to_dict())
+
+        To collect several threads or requests into one profile, create a
+        ``RenderProfile`` and pass it as the argument. Profiles may be
+        nested; each call is recorded in all active profiles of its thread.
+
+        Outside a profiling block the only overhead is one attribute
+        check per call.
+        """
+
+        if profile is None:
+            profile = RenderProfile()
+        return _profiling.activate(profile)
+
     def __getattr__(self, attr):
 
         """Same as the ``tag`` method but using attribue access.
 
         ``HTML.a(...)`` is equivalent to ``HTML.tag("a", ...)``.
+
+        The tags in ``html5_tags`` are methods of the class, so this is
+        only called for other tag names and for names not in lower case.
+        Their methods are cached by lowercase name, but at most
+        ``_tag_method_limit`` of them: when there are more, the cache is
+        emptied. The cache is thread safe.
         """
 
         if attr.startswith('_'):
             raise AttributeError(attr)
-        tag = functools.partial(self.tag, attr.lower())
-        self.__dict__[attr] = tag
-        return tag
+        name = attr.lower()
+        try:
+            return self._tag_methods[name]
+        except KeyError:
+            pass
+        with self._tag_methods_lock:
+            method = self._tag_methods.get(name)
+            if method is None:
+                method = self._bind_tag(name)
+                if len(self._tag_methods) >= self._tag_method_limit:
+                    self._tag_methods = {}
+                self._tag_methods[name] = method
+        return method
+
+    def _bind_tag(self, name):
+        """Return a callable that makes a ``name`` tag.
+
+        It's a bound method calling ``_tag()`` directly, unless a subclass
+        overrides ``tag()``.
+        """
+        if name in html5_tags:
+            return getattr(self, name)
+        if type(self).tag is not HTMLBuilder.tag:
+            return functools.partial(self.tag, name)
+        return _make_tag_method(name).__get__(self, type(self))
 
     def comment(self, *args):
 
@@ -347,10 +437,27 @@ class HTMLBuilder(object):
         contains anything.
         """
 
-        keys = sorted(attrs)
-        fmt = literal(' {0}="{1}"')
-        strings = [fmt.format(x, attrs[x]) for x in keys]
-        return EMPTY.join(strings)
+        if not attrs:
+            return EMPTY
+        key_set = frozenset(attrs)
+        keys = self._attr_orders.get(key_set)
+        if keys is None:
+            keys = tuple(sorted(attrs))
+            if len(self._attr_orders) >= self._attr_order_limit:
+                self._attr_orders.clear()
+            self._attr_orders[key_set] = keys
+        text = six.text_type
+        escape_text = markupsafe.escape
+        plain_types = self._plain_attr_types
+        parts = []
+        for key in keys:
+            value = attrs[key]
+            if type(key) in plain_types and type(value) in plain_types:
+                parts.extend([" ", text(escape_text(key)), '="',
+                    text(escape_text(value)), '"'])
+            else:
+                parts.append(text(literal(' {0}="{1}"').format(key, value)))
+        return literal("".join(parts))
 
     # Private methods
     def optimize_attrs(self, attrs, boolean_attrs=None):
@@ -451,4 +558,136 @@ def lit_sub(*args, **kw):
         return result
 
 
+# The elements of the WHATWG HTML Living Standard. ``HTMLBuilder`` has a
+# method for each, so ``HTML.td(...)`` is a plain method call.
+html5_tags = frozenset("""
+    a abbr address area article aside audio b base bdi bdo blockquote body br
+    button canvas caption cite code col colgroup data datalist dd del details
+    dfn dialog div dl dt em embed fieldset figcaption figure footer form h1 h2
+    h3 h4 h5 h6 head header hgroup hr html i iframe img input ins kbd label
+    legend li link main map mark menu meta meter nav noscript object ol
+    optgroup option output p param picture pre progress q rp rt ruby s samp
+    script search section select slot small source span strong style sub
+    summary sup table tbody td template textarea tfoot th thead time title tr
+    track u ul var video wbr
+    """.split())
+
+def _make_tag_method(name):
+    # ``HTMLBuilder.tag`` with the profiling check, but without the extra
+    # call to it.
+    def tag_method(self, *args, **kw):
+        if _profiling.active:
+            return _profiling.measure("tags", name, self._tag,
+                (name, args, kw))
+        return self._tag(name, args, kw)
+    tag_method.__name__ = str(name)
+    tag_method.__doc__ = 'Same as ``tag("{0}", ...)``.'.format(name)
+    return tag_method
+
+for _name in html5_tags:
+    setattr(HTMLBuilder, _name, _make_tag_method(_name))
+del _name
+
+
+class RenderProfile(object):
+    """Call counts, times and output sizes collected by ``HTML.profile()``.
+
+    Tags are keyed by tag name, helpers by function name. I'm thread safe,
+    so one instance can collect from several threads at once.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, kind, name, seconds, size):
+        """Record one call.
+
+        ``kind`` is "tags" or "helpers". ``seconds`` is the time the call
+        took and ``size`` the size of its output in UTF-8 bytes.
+        """
+        key = kind, name
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = [0, 0.0, 0]
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] += size
+
+    def clear(self):
+        """Discard everything recorded so far."""
+        with self._lock:
+            self._stats.clear()
+
+    def to_dict(self):
+        """Return the statistics as a dict of plain values.
+
+        The dict has keys "tags" and "helpers". Each maps a name to a dict
+        with the keys "calls", "seconds" and "bytes". Times include the
+        time spent in nested tags and helpers.
+        """
+        ret = {"tags": {}, "helpers": {}}
+        with self._lock:
+            for (kind, name), (calls, seconds, size) in self._stats.items():
+                ret[kind][name] = {"calls": calls, "seconds": seconds,
+                    "bytes": size}
+        return ret
+
+
+class _Profiling(threading.local):
+    """The active ``RenderProfile``s of each thread.
+
+    ``active`` is the number of profiling blocks open in *any* thread.
+    It's a class attribute so that the disabled case is a single lookup.
+    """
+
+    active = 0
+    _count_lock = threading.Lock()
+
+    def __init__(self):
+        self.profiles = []
+
+    @contextlib.contextmanager
+    def activate(self, profile):
+        with self._count_lock:
+            _Profiling.active += 1
+        self.profiles.append(profile)
+        try:
+            yield profile
+        finally:
+            self.profiles.remove(profile)
+            with self._count_lock:
+                _Profiling.active -= 1
+
+    def measure(self, kind, name, func, args, kw=None):
+        """Call ``func`` and record it in this thread's profiles, if any."""
+        profiles = self.profiles
+        if not profiles:
+            return func(*args, **(kw or {}))
+        start = default_timer()
+        result = func(*args, **(kw or {}))
+        seconds = default_timer() - start
+        if isinstance(result, six.string_types):
+            size = len(result.encode("utf-8"))
+        else:
+            size = 0
+        for profile in profiles:
+            profile.record(kind, name, seconds, size)
+        return result
+
+_profiling = _Profiling()
+
+
+def profiled(func):
+    """Decorate a helper so that ``HTML.profile()`` records its calls."""
+    name = func.__name__
+    @functools.wraps(func)
+    def wrapper(*args, **kw):
+        if _profiling.active:
+            return _profiling.measure("helpers", name, func, args, kw)
+        return func(*args, **kw)
+    return wrapper
+
+
 HTML = HTMLBuilder()
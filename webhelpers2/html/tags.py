@@ -10,16 +10,20 @@ To create your own custom tags, see ``webhelpers2.html.builder``.
 """
 
 from __future__ import unicode_literals
+import copy
 import datetime
 import logging
+import operator
 import os
 import re
+import uuid
 
 import six
 from six.moves import collections_abc
 
 from webhelpers2 import containers
 from webhelpers2.html import escape, HTML, literal, url_escape
+from webhelpers2.html.builder import profiled
 from webhelpers2.misc import NotGiven
 
 __all__ = [
@@ -28,7 +32,7 @@ __all__ = [
            "text", "textarea", "hidden", "file", "password", 
            "checkbox", "radio", "submit",
            "select", "Options", "Option", "OptGroup",
-           "ModelTags",
+           "ModelTags", "CompiledForm",
            # hyperlinks
            "link_to", "link_to_if", "link_to_unless",
            # Table tags
@@ -48,6 +52,7 @@ log = logging.getLogger(__name__)
 
 ########## Function-based form tag helpers ##########
 
+@profiled
 def form(url, method="post", multipart=False, hidden_fields=None, **attrs):
     """An open tag for a form that will submit to ``url``.
 
@@ -87,29 +92,49 @@ def form(url, method="post", multipart=False, hidden_fields=None, **attrs):
         attrs['method'] = method
     else:
         attrs['method'] = "post"
-        field = hidden("_method", method, id=None)
-        fields.append(field)
+        fields.append(("_method", method))
     if hidden_fields is not None:
         try:
             it = hidden_fields.items()
         except AttributeError:
             it = hidden_fields
-        for name, value in it:
-            field = hidden(name, value, id=None)
-            fields.append(field)
+        fields.extend(it)
     if fields:
-        div = HTML.tag("div", style="display:none", _nl=True, *fields)
+        inputs = "\n".join(_iter_hidden_fields(fields))
+        div = literal('<div style="display:none">\n' + inputs + "\n</div>\n")
     else:
         div = None
     return HTML.tag("form", div, _closed=False, **attrs)
 
 
+_hidden_template = '<input name="{0}" type="hidden" value="{1}" />'
+
+def _iter_hidden_fields(pairs):
+    """Render a hidden input for each ``(name, value)`` pair, as plain text.
+
+    Each is the same as ``hidden(name, value, id=None)``. String and integer
+    names and values are spliced into a fixed template; anything else
+    (None, objects with their own formatting) goes through ``hidden()``.
+    """
+    text = six.text_type
+    plain_values = six.integer_types
+    for name, value in pairs:
+        if (isinstance(name, six.string_types) and
+            (isinstance(value, six.string_types) or
+             type(value) in plain_values)):
+            yield _hidden_template.format(escape(name), escape(value))
+        else:
+            yield text(hidden(name, value, id=None))
+
+
+@profiled
 def end_form():
     """Output "</form>".
     """
     return literal("</form>")
 
 
+@profiled
 def text(name, value=None, id=NotGiven, type="text", **attrs):
     """Create a standard text field.
     
@@ -139,12 +164,14 @@ def text(name, value=None, id=NotGiven, type="text", **attrs):
     return _input(type, name, value, id, attrs)
 
 
+@profiled
 def hidden(name, value=None, id=NotGiven, **attrs):
     """Create a hidden field.
     """
     return _input("hidden", name, value, id, attrs)
 
 
+@profiled
 def file(name, value=None, id=NotGiven, **attrs):
     """Create a file upload field.
     
@@ -160,6 +187,7 @@ def file(name, value=None, id=NotGiven, **attrs):
     return _input("file", name, value, id, attrs)
 
 
+@profiled
 def password(name, value=None, id=NotGiven, **attrs):
     """Create a password field.
     
@@ -169,6 +197,7 @@ def password(name, value=None, id=NotGiven, **attrs):
     return _input("password", name, value, id, attrs)
 
 
+@profiled
 def textarea(name, content="", id=NotGiven, **attrs):
     """Create a text input area.
     """
@@ -177,6 +206,7 @@ def textarea(name, content="", id=NotGiven, **attrs):
     return HTML.tag("textarea", content, **attrs)
 
 
+@profiled
 def checkbox(name, value="1", checked=False, label=None, label_class=None,
     id=NotGiven, **attrs):
     """Create a check box.
@@ -215,6 +245,7 @@ def checkbox(name, value="1", checked=False, label=None, label_class=None,
         widget = HTML.tag("label", widget, " ", label, class_=label_class)
     return widget
 
+@profiled
 def radio(name, value, checked=False, label=None, label_class=None, **attrs):
     """Create a radio button.
 
@@ -251,11 +282,13 @@ def radio(name, value, checked=False, label=None, label_class=None, **attrs):
     return widget
 
 
+@profiled
 def submit(name, value, id=NotGiven, **attrs):
     """Create a submit button with the text ``value`` as the caption."""
     return _input("submit", name, value, id, attrs)
 
 
+@profiled
 def select(name, selected_values, options, id=NotGiven, **attrs):
     """Create a dropdown selection box.
 
@@ -641,6 +674,53 @@ class ModelTags(object):
         content = self._get_value(name, kw)
         return textarea(name, content, **kw)
 
+    def compile(self, fields):
+        """Precompile a form layout for rendering many records.
+
+        ``fields`` is a list of field specs. Each spec is a tuple
+        ``(method, name)`` or ``(method, name, kw)``, where ``method`` is the
+        name of one of my field methods ("text", "select", etc.), ``name``
+        is the field name, and ``kw`` is a dict of the keyword args you
+        would pass to the method (``options`` for "select",
+        ``checked_value`` for "radio", ``default``, HTML attributes, etc.).
+        A plain string is short for ``("text", name)``.
+
+        Return a ``CompiledForm``. Its ``render(record)`` method returns a
+        list of the rendered fields for a record, the same as calling the
+        methods on a ``ModelTags`` for that record. My ``use_keys``,
+        ``date_format`` and ``id_format`` settings apply; my own record is
+        not used.
+        """
+        return CompiledForm(self, fields)
+
+    def render_rows(self, records, fields, row_attrs=None, cell_attrs=None,
+            name_format=None):
+        """Yield a table row of form fields for each record.
+
+        ``records`` is any iterable of records, such as a streaming
+        SQLAlchemy query (``query.yield_per(1000)``). It's consumed lazily,
+        so only one record and one row are in memory at a time.
+
+        ``fields`` is a list of field specs as for ``.compile()``. The
+        layout is compiled once for all rows.
+
+        ``row_attrs`` and ``cell_attrs`` are dicts of HTML attributes for the
+        <tr> and <td> tags.
+
+        ``name_format`` gives each row its own field names, so the fields
+        can be submitted together. It's a ``str.format`` template with
+        ``{name}`` (the field name), ``{index}`` (the 0-based row number) and
+        ``{record}`` (the record, for ``{record.id}`` or ``{record[id]}``),
+        e.g., ``"row-{index}.{name}"``. Automatic IDs follow the new names
+        as they would in ``.text()`` etc. If ``name_format`` is None, every
+        row gets the same field names and IDs.
+
+        Each row is a literal ``<tr>`` containing one ``<td>`` per field,
+        without a trailing newline.
+        """
+        return self.compile(fields).render_rows(records, row_attrs, cell_attrs,
+            name_format)
+
     # Private methods.
     def _get_value(self, name, kw):
         """Get the current value of a field from the database record.
@@ -681,8 +761,247 @@ class ModelTags(object):
             kw['id'] = self.id_format.format(name)
 
 
+class CompiledForm(object):
+    """A form layout precompiled for rendering many records.
+
+    Create me with ``ModelTags.compile()``. Each field is rendered once
+    with a placeholder value when I'm created, and split into static
+    fragments around the value. Rendering a record then only fetches the
+    values (with ``operator.attrgetter`` or ``itemgetter``), escapes them
+    and splices them into the fragments.
+
+    A field whose output doesn't split cleanly (e.g., a ``ModelTags``
+    subclass that transforms values) falls back to calling the method for
+    each record.
+    """
+
+    _placeholder = "\x00"
+
+    def __init__(self, model_tags, fields):
+        self.model_tags = model_tags
+        self.names = []
+        self.defaults = []
+        self._renderers = []
+        self._specs = []
+        self._named_renderers = None
+        for spec in fields:
+            if isinstance(spec, six.string_types):
+                spec = ("text", spec)
+            method, name = spec[0], spec[1]
+            kw = dict(spec[2]) if len(spec) > 2 else {}
+            compile_field = getattr(self, "_compile_" + method, None)
+            if compile_field is None:
+                raise ValueError("can't compile field type {0!r}".format(method))
+            self.names.append(name)
+            self.defaults.append(kw.pop("default", ""))
+            self._specs.append((compile_field, method, kw))
+            self._renderers.append(compile_field(method, name, dict(kw)))
+        if model_tags.use_keys:
+            getter = operator.itemgetter
+        else:
+            getter = operator.attrgetter
+        if len(self.names) == 1:
+            get_one = getter(self.names[0])
+            self._get_values = lambda record: (get_one(record),)
+        elif self.names:
+            self._get_values = getter(*self.names)
+        else:
+            self._get_values = lambda record: ()
+
+    def render(self, record):
+        """Return a list of the rendered fields for ``record``.
+
+        If the record is one of ``ModelTags.undefined_values``, each field
+        gets its ``default`` value.
+        """
+        if self._is_undefined(record):
+            values = self.defaults
+        else:
+            values = self._get_values(record)
+        return [render(value)
+            for render, value in zip(self._renderers, values)]
+
+    def render_rows(self, records, row_attrs=None, cell_attrs=None,
+            name_format=None):
+        """Yield a <tr> of rendered fields for each record.
+
+        See ``ModelTags.render_rows()`` for the arguments.
+        """
+        text = six.text_type
+        tr_start = text(HTML.tag("tr", _closed=False, **(row_attrs or {})))
+        td_start = text(HTML.tag("td", _closed=False, **(cell_attrs or {})))
+        td_sep = "</td>" + td_start
+        for index, record in enumerate(records):
+            if name_format is None:
+                fields = self.render(record)
+            else:
+                fields = self._render_named(record, index, name_format)
+            if fields:
+                content = td_start + td_sep.join(fields) + "</td>"
+            else:
+                content = ""
+            yield literal(tr_start + content + "</tr>")
+
+    def _render_named(self, record, index, name_format):
+        """Render the fields for ``record`` under per-row names.
+
+        The fields are compiled once more with a random marker as the name.
+        The marker is replaced by the row's field name, and the marker's ID
+        form by the row name's ID form, so names and automatic IDs come out
+        as ``ModelTags`` would make them for the row name.
+        """
+        text = six.text_type
+        if self._named_renderers is None:
+            self._name_marker = "N" + uuid.uuid4().hex.upper()
+            self._id_marker = _make_safe_id_component(self._name_marker)
+            self._named_renderers = [
+                compile_field(method, self._name_marker, dict(kw))
+                for compile_field, method, kw in self._specs]
+        if self._is_undefined(record):
+            values = self.defaults
+        else:
+            values = self._get_values(record)
+        fields = []
+        for name, render, value in zip(self.names, self._named_renderers,
+                values):
+            row_name = name_format.format(name=name, index=index,
+                record=record)
+            html = text(render(value))
+            html = html.replace(self._name_marker, text(escape(row_name)))
+            html = html.replace(self._id_marker,
+                _make_safe_id_component(row_name))
+            fields.append(literal(html))
+        return fields
+
+    def _is_undefined(self, record):
+        # Compare with ``==`` for the same reason as ``ModelTags._get_value``.
+        for undefined_value in self.model_tags.undefined_values:
+            if record == undefined_value:
+                return True
+        return False
+
+    def _sample(self, method, name, value, kw, *args):
+        """Render a field as ``ModelTags`` would for a record with ``value``.
+        """
+        tags = copy.copy(self.model_tags)
+        tags.record = {name: value}
+        tags.use_keys = True
+        return getattr(tags, method)(name, *args, **dict(kw))
+
+    def _compile_value(self, method, name, kw, convert=None):
+        text = six.text_type
+        html = text(self._sample(method, name, self._placeholder, kw))
+        parts = html.split(self._placeholder)
+        if len(parts) != 2:
+            return self._fallback(method, name, kw, convert)
+        prefix, suffix = parts
+        html_none = self._sample(method, name, None, kw)
+        def render(value):
+            if convert:
+                value = convert(value)
+            if value is None:
+                return html_none
+            try:
+                escaped = text(escape(value))
+            except TypeError:
+                # E.g., bytes with some escapers; let ``ModelTags`` convert.
+                return self._sample(method, name, value, kw)
+            return literal(prefix + escaped + suffix)
+        return render
+
+    _compile_file = _compile_value
+    _compile_hidden = _compile_value
+    _compile_password = _compile_value
+    _compile_text = _compile_value
+    _compile_textarea = _compile_value
+
+    def _compile_date(self, method, name, kw):
+        date_format = self.model_tags.date_format
+        def convert(value):
+            # Same conversion as ``ModelTags.date``.
+            if isinstance(value, datetime.date):
+                return value.strftime(date_format)
+            elif value == "today":
+                return datetime.date.today().strftime(date_format)
+            else:
+                return ""
+        return self._compile_value("text", name, kw, convert)
+
+    def _compile_checkbox(self, method, name, kw):
+        html_on = self._sample(method, name, True, kw)
+        html_off = self._sample(method, name, False, kw)
+        def render(value):
+            return html_on if value else html_off
+        return render
+
+    def _compile_radio(self, method, name, kw):
+        checked_value = kw.pop("checked_value")
+        html_on = self._sample(method, name, checked_value, kw, checked_value)
+        html_off = self._sample(method, name, object(), kw, checked_value)
+        def render(value):
+            return html_on if value == checked_value else html_off
+        return render
+
+    def _compile_select(self, method, name, kw):
+        text = six.text_type
+        options = kw.pop("options")
+        prompt = kw.pop("prompt", None)
+        if prompt or not isinstance(options, Options):
+            options = Options(options, prompt=prompt)
+        marker_options = Options([self._placeholder])
+        html = text(self._sample(method, name, None, kw, marker_options))
+        prefix, suffix = html.split(text(marker_options.render(())))
+        compiled = _compile_options(options)
+        def render(value):
+            selected_values = Options._parse_selected_values(value)
+            content = _render_compiled_options(compiled, selected_values)
+            return literal(prefix + content + suffix)
+        return render
+
+    def _fallback(self, method, name, kw, convert=None):
+        def render(value):
+            if convert:
+                value = convert(value)
+            return self._sample(method, name, value, kw)
+        return render
+
+
+def _compile_options(options):
+    """Pre-render options for ``CompiledForm``.
+
+    Return a list of ``(value, unselected_html, selected_html)`` tuples for
+    options and ``(optgroup_start_html, children)`` tuples for groups.
+    """
+    text = six.text_type
+    compiled = []
+    for opt in options:
+        if isinstance(opt, OptGroup):
+            start = HTML.tag("optgroup", _closed=False, label=opt.label)
+            compiled.append((text(start), _compile_options(opt)))
+        else:
+            value = opt.value if opt.value is not None else opt.label
+            off = HTML.tag("option", opt.label, value=opt.value)
+            on = HTML.tag("option", opt.label, value=opt.value, selected=True)
+            compiled.append((value, text(off), text(on)))
+    return compiled
+
+def _render_compiled_options(compiled, selected_values):
+    """Render options the same as ``Options.render`` does."""
+    chunks = []
+    for entry in compiled:
+        if len(entry) == 2:
+            content = _render_compiled_options(entry[1], selected_values)
+            chunks.append(entry[0] + "\n" + content + "</optgroup>")
+        elif entry[0] in selected_values:
+            chunks.append(entry[2])
+        else:
+            chunks.append(entry[1])
+    return "\n".join(chunks) + "\n"
+
+
 ########## Hyperlink tags ##########
 
+@profiled
 def link_to(label, url='', **attrs):
     """Create a hyperlink with the given text pointing to the URL.
     
@@ -698,6 +1017,7 @@ def link_to(label, url='', **attrs):
     return HTML.tag("a", label, **attrs)
 
 
+@profiled
 def link_to_if(condition, label, url='', **attrs):
     """Same as ``link_to`` but return just the label if the condition is false.
     
@@ -710,6 +1030,7 @@ def link_to_if(condition, label, url='', **attrs):
     else:
         return HTML(label)
 
+@profiled
 def link_to_unless(condition, label, url='', **attrs):
     """The opposite of ``link_to``. Return just the label if the condition is 
     true.
@@ -722,6 +1043,7 @@ def link_to_unless(condition, label, url='', **attrs):
 
 ########## Table tags ##########
 
+@profiled
 def th_sortable(current_order, column_order, label, url,
     class_if_sort_column="sort", class_if_not_sort_column=None, 
     link_attrs=None, name="th", **attrs):
@@ -766,6 +1088,7 @@ def th_sortable(current_order, column_order, label, url,
 
 ########## Other non-form tags ##########
 
+@profiled
 def ul(items, default=None, li_attrs=None, **attrs):
     R"""Return an unordered list with each item wrapped in <li>.
 
@@ -782,6 +1105,7 @@ def ul(items, default=None, li_attrs=None, **attrs):
     li_attrs = li_attrs or {}
     return _list("ul", items, default, attrs, li_attrs)
 
+@profiled
 def ol(items, default=literal(""), li_attrs=None, **attrs):
     R"""Return an ordered list with each item wrapped in <li>.
 
@@ -808,6 +1132,7 @@ def _list(tag, items, default, attrs, li_attrs):
     return HTML.tag(tag, content, **attrs)
     
 
+@profiled
 def image(url, alt, width=None, height=None, **attrs):
     """Return an image tag for the specified ``source``.
 
@@ -846,6 +1171,7 @@ def image(url, alt, width=None, height=None, **attrs):
 
 ########## Tags for the HTML head ##########
 
+@profiled
 def javascript_link(*urls, **attrs):
     """Return script include tags for the specified javascript URLs.
     
@@ -862,6 +1188,7 @@ def javascript_link(*urls, **attrs):
     return literal("\n").join(tags)
 
 
+@profiled
 def stylesheet_link(*urls, **attrs):
     """Return CSS link tags for the specified stylesheet URLs.
 
@@ -880,6 +1207,7 @@ def stylesheet_link(*urls, **attrs):
     return literal('\n').join(tags)
 
 
+@profiled
 def auto_discovery_link(url, feed_type="rss", **attrs):
     """Return a link tag allowing auto-detecting of RSS or ATOM feed.
     
@@ -973,6 +1301,32 @@ def _set_id_attr(attrs, id_arg, name):
         attrs["id"] = id_arg
     # Else id_arg is None or "", so do nothing.
 
+class _SafeIdTable(dict):
+    """The ``str.translate`` table used by ``_make_safe_id_component()``.
+
+    Each character is mapped on its own, as the two substitutions it replaces
+    only ever matched single characters. Latin-1 characters are mapped up
+    front; others are mapped when looked up and not cached.
+    """
+
+    whitespace_rx = re.compile(r"\s")
+    word_rx = re.compile(r"[-\w]")
+
+    def __init__(self):
+        for i in range(256):
+            self[i] = self.__missing__(i)
+
+    def __missing__(self, codepoint):
+        c = six.unichr(codepoint)
+        if self.whitespace_rx.match(c):
+            return "_"
+        elif self.word_rx.match(c):
+            return c
+        else:
+            return None
+
+_safe_id_table = _SafeIdTable()
+
 def _make_safe_id_component(idstring):
     """Make a string safe for including in an id attribute.
 
@@ -988,8 +1342,4 @@ def _make_safe_id_component(idstring):
     matches ``\\w`` (alphanumerics and underscore) is removed.
 
     """
-    # Transform all whitespace to underscore
-    idstring = re.sub(r'\s', "_", '%s' % idstring)
-    # Remove everything that is not a hyphen or a member of \w
-    idstring = re.sub(r'(?!-)\W', "", idstring).lower()
-    return idstring
+    return ('%s' % idstring).translate(_safe_id_table).lower()
@@ -18,17 +18,24 @@ from six.moves.urllib.parse import urlencode
 
 from webhelpers2.html._autolink import auto_link
 from webhelpers2.html._render import html_to_text, sanitize
+from webhelpers2.html._render import is_stream_source, iter_chunks
+from webhelpers2.containers import LRUCache
 from webhelpers2.html import HTML, literal, lit_sub, escape
+from webhelpers2.html.builder import profiled
 import webhelpers2.html.tags as tags
 
 __all__ = [
     "auto_link", 
+    "bar_chart",
     "button_to", 
     "html_to_text",
     "js_obfuscate",
     "highlight", 
     "mail_to",
+    "MailToRenderer",
     "nl2br",
+    "paginate_links",
+    "ParamUpdater",
     "sanitize",
     "strip_links",
     "strip_tags",
@@ -45,6 +52,7 @@ _paragraph_rx = re.compile(R"\n{2,}")  # Paragraph break: 2 or more newlines.
 br = HTML.BR
 
 
+@profiled
 def button_to(name, url='', **html_attrs):
     """Generate a form containing a sole button that submits to
     ``url``. 
@@ -147,6 +155,7 @@ def button_to(name, url='', **html_attrs):
         method=form_method, action=url, class_="button-to")
     return form
 
+@profiled
 def js_obfuscate(content):
     """Obfuscate data in a Javascript tag.
     
@@ -157,7 +166,7 @@ def js_obfuscate(content):
         
     """
     doc_write = "document.write(%s);" % js_quote_string(content)
-    obfuscated = ''.join(['%%%x' % ord(x) for x in doc_write])
+    obfuscated = doc_write.translate(_percent_hex)
     complete = "eval(unescape('%s'))" % obfuscated
     cdata = HTML.cdata("\n", complete, "\n//")
     return HTML.tag("script", "\n//", cdata, "\n", type="text/javascript")
@@ -176,17 +185,63 @@ def js_quote_string(s, safe_chars=JS_STRING_SAFE_CHARS):
     using javascripts ``\\xXX`` or ``\\uXXXX`` escapes.
 
     """
-    chars = []
-    for c in s:
-        if c in safe_chars:
-            chars.append(c)
+    if safe_chars is JS_STRING_SAFE_CHARS:
+        table = _js_quote
+    else:
+        table = _JSQuoteTable(safe_chars)
+    return "'{0}'".format(six.text_type(s).translate(table))
+    
+
+class _CharTable(dict):
+    """A ``str.translate`` table that encodes each character with a function.
+
+    Latin-1 characters are encoded up front. Others are encoded when
+    looked up and not cached, so arbitrary input can't grow the table.
+    """
+
+    def __init__(self, encode):
+        self.encode = encode
+        for i in range(256):
+            self[i] = encode(six.unichr(i))
+
+    def __missing__(self, codepoint):
+        return self.encode(six.unichr(codepoint))
+
+
+class _JSQuoteTable(_CharTable):
+    def __init__(self, safe_chars):
+        self.safe_chars = frozenset(safe_chars)
+        super(_JSQuoteTable, self).__init__(self.quote)
+
+    def quote(self, c):
+        if c in self.safe_chars:
+            return c
         elif ord(c) < 256:
-            chars.append('\\x{0:02X}'.format(ord(c)))
+            return '\\x{0:02X}'.format(ord(c))
         else:
-            chars.append('\\u{0:04X}'.format(ord(c)))
-    return "'{0}'".format(''.join(chars))
-    
+            return '\\u{0:04X}'.format(ord(c))
+
+
+def _encode_percent_hex(c):
+    return '%%%x' % ord(c)
+
+def _encode_decimal_entity(c):
+    return '&#%d;' % ord(c)
+
+def _encode_word_percent_hex(c):
+    if _word_rx.match(c):
+        return '%%%x' % ord(c)
+    return c
 
+_word_rx = re.compile(r'\w')
+_percent_hex = _CharTable(_encode_percent_hex)
+_decimal_entity = _CharTable(_encode_decimal_entity)
+_word_percent_hex = _CharTable(_encode_word_percent_hex)
+_js_quote = _JSQuoteTable(JS_STRING_SAFE_CHARS)
+_mailto_decimal_entity = 'mailto:'.translate(_decimal_entity)
+
+
+@profiled
 def mail_to(email_address, name=None, cc=None, bcc=None, subject=None, 
     body=None, replace_at=None, replace_dot=None, encode=None, **html_attrs):
     """Create a link tag for starting an email to the specified 
@@ -240,18 +295,11 @@ def mail_to(email_address, name=None, cc=None, bcc=None, subject=None,
             replace_dot)
 
     if encode == 'hex':
-        email_address_obfuscated = HTML.literal(''.join(
-            ['&#%d;' % ord(x) for x in email_address_obfuscated]))
-        protocol = HTML.literal(''.join(['&#%d;' % ord(x) for x in protocol]))
-
-        word_re = re.compile(r'\w')
-        encoded_parts = []
-        for x in email_address:
-            if word_re.match(x):
-                encoded_parts.append('%%%x' % ord(x))
-            else:
-                encoded_parts.append(x)
-        email_address = HTML.literal(''.join(encoded_parts))
+        email_address_obfuscated = HTML.literal(six.text_type(
+            email_address_obfuscated).translate(_decimal_entity))
+        protocol = HTML.literal(_mailto_decimal_entity)
+        email_address = HTML.literal(six.text_type(
+            email_address).translate(_word_percent_hex))
 
     url = HTML.literal(protocol + email_address)
     if options_query:
@@ -262,7 +310,7 @@ def mail_to(email_address, name=None, cc=None, bcc=None, subject=None,
 
     if encode == 'javascript':
         tmp = "document.write('%s');" % tag
-        string = ''.join(['%%%x' % ord(x) for x in tmp])
+        string = tmp.translate(_percent_hex)
         return HTML.tag("script",
             HTML.literal("\n//<![CDATA[\neval(unescape('%s'))\n//]]>\n" % string),
                          type="text/javascript")
@@ -270,7 +318,77 @@ def mail_to(email_address, name=None, cc=None, bcc=None, subject=None,
         return tag
 
 
+class MailToRenderer(object):
+    """Render ``mail_to`` links with a cache of recent results.
+
+    A page listing the same people on every request -- a staff directory,
+    comment authors -- obfuscates the same addresses over and over. I
+    remember the links I've rendered in an ``LRUCache``, so each one is
+    encoded only once while it's in the cache. The results are identical
+    to ``mail_to()``'s.
+
+    Usage::
+
+        >>> render_mail_to = MailToRenderer(maxsize=5000, encode="hex")
+        >>> link = render_mail_to("me@domain.com", "My email")
+        >>> links = render_mail_to.render_many(["a@example.com", "b@example.com"])
+        >>> sorted(render_mail_to.stats().items())
+        [('hits', 0), ('maxsize', 5000), ('misses', 3), ('size', 3)]
+
+    ``maxsize`` is the cache size; see ``LRUCache``.
+
+    ``**defaults`` are keyword args for ``mail_to()`` that apply to every
+    call, such as ``encode``, ``replace_at`` and ``replace_dot``. They can
+    be overridden per call.
+
+    Calls with unhashable arguments (e.g., a list-valued ``class_``) are
+    rendered normally but not cached.
+    """
+
+    def __init__(self, maxsize=1024, **defaults):
+        self.cache = LRUCache(maxsize)
+        self.defaults = defaults
+
+    def __call__(self, email_address, name=None, **kw):
+        """Same as ``mail_to()`` but consult the cache first."""
+        if self.defaults:
+            args = self.defaults.copy()
+            args.update(kw)
+        else:
+            args = kw
+        # A literal and a str with the same text are equal but render
+        # differently, so the key includes the type of each argument.
+        key = (type(email_address), email_address, type(name), name,
+            tuple(sorted((k, type(v), v) for k, v in args.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return mail_to(email_address, name, **args)
+        tag = self.cache.get(key)
+        if tag is None:
+            tag = self.cache[key] = mail_to(email_address, name, **args)
+        return tag
 
+    def render_many(self, addresses, **kw):
+        """Render a link for each address and return a list of them.
+
+        ``addresses`` is an iterable of e-mail addresses or
+        ``(email_address, name)`` pairs. ``**kw`` are passed to every call.
+        """
+        ret = []
+        for address in addresses:
+            if isinstance(address, tuple):
+                ret.append(self(address[0], address[1], **kw))
+            else:
+                ret.append(self(address, **kw))
+        return ret
+
+    def stats(self):
+        """Return the cache counters as a dict; see ``LRUCache.stats()``."""
+        return self.cache.stats()
+
+
+@profiled
 def highlight(text, phrase, case_sensitive=False, class_="highlight", **attrs):
     """Highlight all occurrences of ``phrase`` in ``text``.
 
@@ -319,6 +437,7 @@ def highlight(text, phrase, case_sensitive=False, class_="highlight", **attrs):
         return HTML.tag("strong", m.group(), class_=class_, **attrs)
     return lit_sub(rx, repl, text)
 
+@profiled
 def strip_links(text):
     """
     Strip link tags from ``text`` leaving just the link label.
@@ -336,7 +455,8 @@ def strip_links(text):
     strip_re = re.compile(r'<a\b.*?>(.*?)<\/a>', re.I | re.M)
     return lit(strip_re.sub(r'\1', text))
 
-def strip_tags(text):
+@profiled
+def strip_tags(text, encoding="utf-8"):
     """Delete any HTML tags in the text, leaving their contents intact.
     Convert newlines to spaces, and <br /> to newlines.
 
@@ -352,7 +472,16 @@ def strip_tags(text):
 
     ``sanitize()`` does almost the same thing, but has a different
     implementation.
+
+    ``text`` may also be a file, ``mmap``, or path object, as for
+    ``html_to_text()``. The input is processed in chunks and the result
+    is returned as a string.
     """
+    if is_stream_source(text):
+        return "".join(_iter_strip_tags(iter_chunks(text, encoding)))
+    return _strip_tags(text)
+
+def _strip_tags(text):
     text = text.replace('\n', ' ')
     text = text.replace('\r', '')
     text = br_re.sub('\n', text)
@@ -360,7 +489,53 @@ def strip_tags(text):
     text = tag_re.sub('', text)
     return text
 
+def _iter_strip_tags(chunks):
+    """Apply ``strip_tags`` to a sequence of text chunks.
 
+    Each substitution runs as its own stage, holding back anything that
+    might be the start of a match until the next chunk arrives, so the
+    output is the same as stripping the concatenated text at once.
+    """
+    chunks = (x.replace('\n', ' ').replace('\r', '') for x in chunks)
+    chunks = _iter_sub_tags(br_re, '\n', chunks)
+    chunks = _iter_sub_comments(chunks)
+    return _iter_sub_tags(tag_re, '', chunks)
+
+def _iter_sub_tags(rx, repl, chunks):
+    # Hold back from the first '<' after the last '>': that may be a tag
+    # that isn't closed yet.
+    carry = ''
+    for chunk in chunks:
+        buf = carry + chunk
+        end = buf.find('<', buf.rfind('>') + 1)
+        if end == -1:
+            end = len(buf)
+        carry = buf[end:]
+        yield rx.sub(repl, buf[:end])
+    if carry:
+        yield rx.sub(repl, carry)
+
+def _iter_sub_comments(chunks):
+    # Hold back a trailing partial '<!--' or '-->' after the last match.
+    carry = ''
+    for chunk in chunks:
+        buf = carry + chunk
+        end = len(buf)
+        last = 0
+        for m in comment_re.finditer(buf):
+            last = m.end()
+        for i in range(max(last, end - 3), end):
+            tail = buf[i:]
+            if '<!--'.startswith(tail) or '-->'.startswith(tail):
+                end = i
+                break
+        carry = buf[end:]
+        yield comment_re.sub('', buf[:end])
+    if carry:
+        yield comment_re.sub('', carry)
+
+
+@profiled
 def nl2br(text):
     """Insert a <br /> before each newline.
     """
@@ -370,6 +545,7 @@ def nl2br(text):
     text = HTML(text).replace("\n", br)
     return text
 
+@profiled
 def text_to_html(text, preserve_lines=False):
     """Convert text to HTML paragraphs.
 
@@ -392,6 +568,7 @@ def text_to_html(text, preserve_lines=False):
         paragraphs[i] = HTML.tag("p", para)
     return literal("\n\n").join(paragraphs)
 
+@profiled
 def update_params(_url, _debug=False, **params):
     """Update the query parameters in a URL.
 
@@ -447,3 +624,276 @@ def update_params(_url, _debug=False, **params):
     if fragment:
         fragment = "#" + fragment
     return "{0}{1}{2}".format(url, qs, fragment)
+
+
+class ParamUpdater(object):
+    """Update the query parameters of one URL many times.
+
+    This is ``update_params()`` with the URL parsing done once up front.
+    It's meant for pagination links and similar cases where many URLs are
+    generated from the same base URL, changing only one or two parameters.
+
+    Usage:
+
+    >>> page_url = ParamUpdater("/articles?sort=date&page=1#top")
+    >>> page_url(page=2)
+    '/articles?sort=date&page=2#top'
+    >>> page_url(page=3, sort=None)
+    '/articles?page=3#top'
+
+    Calling the instance gives the same result as calling
+    ``update_params()`` with the base URL and the same keyword args. The
+    unchanged parameters are encoded once for each distinct sequence of
+    keyword names; only the values passed in are encoded on each call.
+    """
+
+    def __init__(self, url):
+        self.url, self.fragment = urldefrag(url)
+        if "?" in self.url:
+            self.url, qs = self.url.split("?", 1)
+            query = parse_qs(qs)
+        else:
+            query = {}
+        self.query = query
+        self._encoded = [(k, urlencode({k: v}, True)) for k, v in query.items()]
+        self._suffix = "#" + self.fragment if self.fragment else ""
+        self._layouts = {}
+
+    def __call__(self, **params):
+        """Return the base URL with ``params`` added or replaced.
+
+        The arguments are the same as ``update_params()``'s ``**params``.
+        """
+        # New parameters are added in keyword order, so that's part of the
+        # key.
+        names = tuple(params)
+        layout = self._layouts.get(names)
+        if layout is None:
+            layout = self._layouts[names] = self._layout(params)
+        parts = []
+        for part in layout:
+            if isinstance(part, tuple):
+                value = params[part[0]]
+                if value is None:
+                    continue
+                part = urlencode({part[0]: value}, True)
+            if part:
+                parts.append(part)
+        if parts:
+            return "{0}?{1}{2}".format(self.url, "&".join(parts), self._suffix)
+        return self.url + self._suffix
+
+    def _layout(self, params):
+        """Plan the query string for a set of parameter names.
+
+        Return a list of pre-encoded strings for runs of unchanged
+        parameters, and 1-tuples containing the name of each parameter to
+        encode at call time, in the order ``update_params()`` would
+        output them.
+        """
+        layout = []
+        static = []
+        for key, encoded in self._encoded:
+            if key in params:
+                if static:
+                    layout.append("&".join(static))
+                    static = []
+                layout.append((key,))
+            elif encoded:
+                static.append(encoded)
+        if static:
+            layout.append("&".join(static))
+        for key in params:
+            if key not in self.query:
+                layout.append((key,))
+        return layout
+
+
+@profiled
+def paginate_links(url, page, page_count, window=2, param="page", gap="...",
+    li_attrs=None, link_attrs=None, **attrs):
+    """Return a <ul> of links to the pages of a multi-page listing.
+
+    ``url``: the URL of the listing. The page number is set in its query
+    string as for ``update_params()``; other parameters are kept.
+
+    ``page``: the current page number (1-based). It's shown as plain text
+    rather than a link. Raise ValueError if it's not between 1 and
+    ``page_count``.
+
+    ``page_count``: the total number of pages. If it's less than 2, return
+    an empty literal.
+
+    ``window``: how many pages to show on each side of the current page.
+    The first and last pages are always shown. Larger skips are replaced
+    by ``gap``; a skip of a single page shows that page instead.
+
+    ``param``: the name of the query parameter for the page number.
+
+    ``li_attrs``: dict of attributes for each <li>.
+
+    ``link_attrs``: dict of attributes for each <a>.
+
+    ``**attrs``: attributes for the <ul>.
+
+    The result is the same as building the list with ``update_params()``,
+    ``link_to_if()`` and ``ul()``, but the URL is parsed once and the <li>
+    and <a> tags are rendered once as templates. Only ``2 * window + 5``
+    items are generated however many pages there are.
+
+    >>> paginate_links("/articles?sort=date", 5, 9, window=1)
+    literal(u'<ul>\\n<li><a href="/articles?sort=date&amp;page=1">1</a></li>\\n<li>...</li>\\n<li><a href="/articles?sort=date&amp;page=4">4</a></li>\\n<li>5</li>\\n<li><a href="/articles?sort=date&amp;page=6">6</a></li>\\n<li>...</li>\\n<li><a href="/articles?sort=date&amp;page=9">9</a></li>\\n</ul>')
+    """
+    if page_count < 2:
+        return literal("")
+    if not 1 <= page <= page_count:
+        raise ValueError("page {0} is not between 1 and {1}".format(page,
+            page_count))
+    page_url = ParamUpdater(url)
+    # Render the tags once and split them into text templates.
+    text = six.text_type
+    li_start = text(HTML.tag("li", _closed=False, **(li_attrs or {})))
+    li_end = "</li>"
+    link_attrs = dict(link_attrs or {})
+    slot = _make_slot(text(HTML.tag("a", **link_attrs)))
+    link_attrs["href"] = literal(slot)
+    link = text(HTML.tag("a", literal(slot), **link_attrs))
+    link_start, link_mid, link_end = link.split(slot)
+    gap = text(escape(gap))
+    items = [""]
+    for i in _page_window(page, page_count, window):
+        if i is None:
+            items.append(li_start + gap + li_end)
+        elif i == page:
+            items.append(li_start + text(i) + li_end)
+        else:
+            href = text(escape(page_url(**{param: i})))
+            items.append("".join([li_start, link_start, href, link_mid,
+                text(i), link_end, li_end]))
+    items.append("")
+    return HTML.tag("ul", literal("\n".join(items)), **attrs)
+
+def _make_slot(*texts):
+    """Return a placeholder of NULs that doesn't occur in any of ``texts``.
+
+    Helpers that render a tag once as a template put the placeholder where
+    the variable parts go, and split the result at it.
+    """
+    slot = "\0"
+    while any(slot in t for t in texts):
+        slot += "\0"
+    return slot
+
+def _page_window(page, page_count, window):
+    """Yield the page numbers to show in a pager, and None for gaps."""
+    start = max(1, page - window)
+    end = min(page_count, page + window)
+    if start > 1:
+        yield 1
+    if start > 3:
+        yield None
+    elif start == 3:
+        yield 2
+    for i in range(start, end + 1):
+        yield i
+    if end < page_count - 2:
+        yield None
+    elif end == page_count - 2:
+        yield page_count - 1
+    if end < page_count:
+        yield page_count
+
+
+@profiled
+def bar_chart(values, labels=None, width=100, height=20, gap=1, svg=True,
+    bar_attrs=None, **attrs):
+    """Return a small bar chart of some numbers, e.g., a histogram.
+
+    ``values``: the height of each bar. The tallest bar fills the chart;
+    negative values are drawn as empty bars.
+
+    ``labels``: a list of the same length, giving a tooltip for each bar.
+
+    ``width``, ``height``: the size of the chart in pixels.
+
+    ``gap``: the space between bars in pixels.
+
+    ``svg``: if true (the default), return an inline <svg> element of
+    <rect> bars. If false, return a <span> of inline-block <span> bars
+    for browsers or email clients without SVG; these get a ``style``
+    attribute.
+
+    ``bar_attrs``: dict of attributes for each bar, e.g., ``fill`` or
+    ``class_``.
+
+    ``**attrs``: attributes for the <svg> or outer <span>.
+
+    Each bar is spliced into a template rendered once, so a chart of many
+    bars costs little more than building the strings.
+
+    >>> bar_chart([1, 3, 2], ["a", "b", "c"], width=32, height=9)
+    literal(u'<svg height="9" viewBox="0 0 32 9" width="32" xmlns="http://www.w3.org/2000/svg">\\n<rect height="3" width="10" x="0" y="6"><title>a</title></rect>\\n<rect height="9" width="10" x="11" y="0"><title>b</title></rect>\\n<rect height="6" width="10" x="22" y="3"><title>c</title></rect>\\n</svg>')
+    """
+    values = list(values)
+    if labels is None:
+        labels = [""] * len(values)
+    else:
+        labels = [six.text_type(escape(x)) for x in labels]
+        if len(labels) != len(values):
+            raise ValueError("need one label per value")
+    bar_attrs = dict(bar_attrs or {})
+    text = six.text_type
+    # Render a bar with and without a label, and split them into templates
+    # at the slots. Attributes are sorted, so the slots are in the order
+    # height, width, x, y, label for SVG; and style, label for HTML.
+    slot = _make_slot(text(HTML.tag("rect", **bar_attrs)))
+    if svg:
+        for name in ["height", "width", "x", "y"]:
+            bar_attrs[name] = literal(slot)
+        templates = [text(HTML.tag("rect", "", **bar_attrs)),
+            text(HTML.tag("rect", literal("<title>" + slot + "</title>"),
+                **bar_attrs))]
+    else:
+        bar_attrs["style"] = literal(slot)
+        templates = [text(HTML.tag("span", "", **bar_attrs))]
+        bar_attrs["title"] = literal(slot)
+        templates.append(text(HTML.tag("span", "", **bar_attrs)))
+    templates = [x.split(slot) for x in templates]
+    count = len(values)
+    top = max(values + [0])
+    bar_width = (width - gap * (count - 1)) / float(count) if count else 0
+    bars = [""]
+    for i, (value, label) in enumerate(zip(values, labels)):
+        bar_height = height * value / float(top) if value > 0 else 0
+        if svg:
+            fields = [bar_height, bar_width, i * (bar_width + gap),
+                height - bar_height]
+            fields = [_format_length(x) for x in fields]
+        else:
+            margin = gap if i < count - 1 else 0
+            style = ("display:inline-block;vertical-align:bottom;width:{0}px;"
+                "height:{1}px;margin-right:{2}px").format(
+                _format_length(bar_width), _format_length(bar_height),
+                _format_length(margin))
+            fields = [style]
+        if label:
+            fields.append(label)
+        template = templates[bool(label)]
+        parts = [template[0]]
+        for field, part in zip(fields, template[1:]):
+            parts.append(field)
+            parts.append(part)
+        bars.append("".join(parts))
+    bars.append("")
+    content = literal("\n".join(bars))
+    if svg:
+        attrs.setdefault("xmlns", "http://www.w3.org/2000/svg")
+        attrs.setdefault("viewBox", "0 0 {0} {1}".format(width, height))
+        return HTML.tag("svg", content, width=width, height=height, **attrs)
+    style = "display:inline-block;height:{0}px;line-height:0".format(height)
+    attrs.setdefault("style", style)
+    return HTML.tag("span", content, **attrs)
+
+def _format_length(x):
+    """Format a length with at most 2 decimals and no trailing zeros."""
+    return ("%.2f" % x).rstrip("0").rstrip(".")
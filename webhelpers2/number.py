@@ -1,7 +1,21 @@
-"""Number formatting, numeric helpers, and numeric statistics."""
+"""Number formatting, numeric helpers, and numeric statistics.
 
+The statistics functions accept NumPy arrays and ``array.array`` or other
+numeric buffers. If NumPy is installed, these are computed with NumPy's
+vectorized routines instead of a Python loop. NumPy is only imported when
+such an argument is first seen.
+"""
+
+import array
+import bisect
+import itertools
 import math
+import numbers
+import operator
+import random
 import re
+import struct
+import sys
 
 #### Calculations ####
 
@@ -11,15 +25,81 @@ def percent_of(part, whole):
     # Use float to force true division.
     return float(part * 100) / whole
 
+def percents_of(parts, whole, zero=None):
+    """Return ``percent_of(part, whole)`` for each of ``parts``.
+
+    ``whole`` is a number, or an iterable of numbers the same length as
+    ``parts`` (e.g., the row totals of a table). Where the whole is 0,
+    the result is ``zero`` instead of raising ZeroDivisionError.
+
+        >>> percents_of([1, 2, 5], 8)
+        [12.5, 25.0, 62.5]
+        >>> percents_of([1, 0, 3], [4, 0, 6])
+        [25.0, None, 50.0]
+
+    If ``parts`` or ``whole`` is a NumPy array and NumPy is installed, the
+    percentages are computed with one vectorized division. The result is
+    still a list.
+
+    Raise ValueError if ``whole`` is an iterable of a different length.
+    """
+    part_array = _as_array(parts)
+    whole_array = _as_array(whole)
+    if part_array is not None or whole_array is not None:
+        return _array_percents_of(part_array, whole_array, parts, whole, zero)
+    if isinstance(whole, numbers.Number):
+        if whole == 0:
+            return [zero for part in parts]
+        return [float(part * 100) / whole for part in parts]
+    parts = list(parts)
+    wholes = list(whole)
+    if len(parts) != len(wholes):
+        raise ValueError("{0} parts but {1} wholes".format(len(parts),
+            len(wholes)))
+    return [float(part * 100) / w if w else zero
+        for part, w in zip(parts, wholes)]
+
+def _array_percents_of(part_array, whole_array, parts, whole, zero):
+    numpy = _get_numpy()
+    if part_array is None:
+        part_array = numpy.array(list(parts))
+    if whole_array is None:
+        if isinstance(whole, numbers.Number):
+            whole_array = numpy.array(whole)
+        else:
+            whole_array = numpy.array(list(whole))
+    if whole_array.ndim and whole_array.size != part_array.size:
+        raise ValueError("{0} parts but {1} wholes".format(part_array.size,
+            whole_array.size))
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        result = part_array * 100.0 / whole_array
+    result = result.tolist()
+    if not (whole_array == 0).any():
+        return result
+    is_zero = numpy.broadcast_to(whole_array == 0, part_array.shape).tolist()
+    return [zero if z else x for x, z in zip(result, is_zero)]
+
 #### Statistics ####
 
 def mean(r):
     """Return the mean (i.e., average) of a sequence of numbers.
+
+    ``r`` may also be an iterator, such as a generator; the numbers are
+    then added up as they're read with ``RunningStats``.
     """
+    a = _as_array(r)
+    if a is not None:
+        if a.size == 0:
+            raise ValueError("can't calculate mean of empty collection")
+        return float(a.mean())
     try:
-        return float(sum(r)) / len(r)
-    except ZeroDivisionError:
+        n = len(r)
+    except TypeError:
+        # An iterator: accumulate it in one pass.
+        return RunningStats(r).mean
+    if n == 0:
         raise ValueError("can't calculate mean of empty collection")
+    return float(sum(r)) / n
 
 average = mean
 
@@ -47,22 +127,276 @@ def median(r):
     The median here is somewhat close to the majority of incomes, while the
     mean is far from anybody's income.
     
-    This implementation makes a temporary list of all numbers in memory.
+    This implementation makes a temporary list of all numbers in memory,
+    but finds the middle by selection rather than sorting the list. See
+    ``quantiles()`` for other points than the middle.
     """
+    a = _as_array(r)
+    if a is not None:
+        return _array_median(a)
     s = list(r)
     s_len = len(s)
     if s_len == 0:
         raise ValueError("can't calculate median of empty collection")
-    s.sort()
     center = s_len // 2
     is_odd = s_len % 2
     if is_odd:
-        return s[center]   # Return the center element.
+        return _select(s, [center])[center]   # Return the center element.
     # Return the average of the two elements nearest the center.
-    low = s[center-1]
-    high = s[center]
+    found = _select(s, [center-1, center])
+    low = found[center-1]
+    high = found[center]
     return mean([low, high])
 
+def quantiles(r, probabilities, approximate=False):
+    """Return the values below which the given fractions of numbers fall.
+
+    ``r`` is an iterable of numbers. ``probabilities`` is a list of
+    fractions between 0 and 1; e.g., 0.5 for the median or 0.99 for the
+    99th percentile. The return value is a list of the same length.
+
+    Each result is interpolated linearly between the two nearest ranks,
+    like NumPy's default method and Excel's ``PERCENTILE``. A
+    probability of 0 gives the minimum and 1 gives the maximum.
+
+        >>> quantiles([15, 20, 35, 40, 50], [0.25, 0.5, 0.9])
+        [20, 35, 46.0]
+
+    By default the result is exact. The numbers are copied into a list, and
+    the ranks are found by quickselect, which takes expected linear time
+    rather than the O(n log n) time of sorting.
+
+    If ``approximate`` is true, use the P-squared algorithm instead (see
+    ``P2Quantile``). This reads the numbers once and uses constant memory,
+    for large streams where an estimate is good enough.
+
+    Raise ValueError if ``r`` is empty or a probability is out of range.
+    """
+    for q in probabilities:
+        if not 0 <= q <= 1:
+            raise ValueError("probability {0!r} is not between 0 and 1"
+                .format(q))
+    if approximate:
+        estimators = [P2Quantile(q) for q in probabilities]
+        for x in r:
+            for estimator in estimators:
+                estimator.add(x)
+        return [estimator.value for estimator in estimators]
+    a = _as_array(r)
+    if a is not None:
+        if a.size == 0:
+            raise ValueError("can't calculate quantiles of empty collection")
+        percents = [q * 100 for q in probabilities]
+        return _get_numpy().percentile(a, percents).tolist()
+    s = list(r)
+    if not s:
+        raise ValueError("can't calculate quantiles of empty collection")
+    positions = [_rank_position(len(s), q) for q in probabilities]
+    ranks = set()
+    for low, fraction in positions:
+        ranks.add(low)
+        if fraction:
+            ranks.add(low + 1)
+    found = _select(s, sorted(ranks))
+    return [_interpolate(found, low, fraction) for low, fraction in positions]
+
+def percentile(r, percent, approximate=False):
+    """Return the ``percent`` percentile of the numbers in ``r``.
+
+    ``percent`` is between 0 and 100. This is the same as
+    ``quantiles(r, [percent / 100.0], approximate)[0]``.
+
+        >>> percentile([15, 20, 35, 40, 50], 40)
+        29.0
+    """
+    return quantiles(r, [percent / 100.0], approximate)[0]
+
+class P2Quantile(object):
+    """An estimate of one quantile of a stream, in constant memory.
+
+    This is the P-squared algorithm of Jain and Chlamtac (1985). It keeps
+    five markers whose heights track the minimum, the quantile, the
+    maximum and points halfway to them, adjusting them with a parabolic
+    formula as numbers arrive. The estimate is usually within a few percent
+    of the spread of nearby values, and is exact for the first five numbers.
+
+        >>> estimator = P2Quantile(0.5, range(1001))
+        >>> estimator.value
+        500.0
+
+    ``p`` is the quantile as a fraction between 0 and 1. ``numbers`` is an
+    optional iterable of initial numbers.
+    """
+
+    def __init__(self, p, numbers=()):
+        if not 0 <= p <= 1:
+            raise ValueError("probability {0!r} is not between 0 and 1"
+                .format(p))
+        self.p = p
+        self.count = 0
+        self._heights = []
+        self._positions = [1, 2, 3, 4, 5]
+        self._desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self._increments = [0, p / 2.0, p, (1 + p) / 2.0, 1]
+        self.update(numbers)
+
+    def add(self, x):
+        """Add one number."""
+        self.count += 1
+        q = self._heights
+        if self.count <= 5:
+            bisect.insort(q, x)
+            return
+        # Find the cell k with q[k] <= x < q[k+1], stretching the end
+        # markers if x is a new extreme.
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = bisect.bisect_right(q, x) - 1
+        n = self._positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        desired = self._desired
+        for i in range(5):
+            desired[i] += self._increments[i]
+        # Move the middle markers one position toward their desired
+        # positions if they're off by one or more.
+        for i in (1, 2, 3):
+            d = desired[i] - n[i]
+            if (d >= 1 and n[i+1] - n[i] > 1) or (d <= -1 and n[i-1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = self._parabolic(i, d)
+                if not q[i-1] < height < q[i+1]:
+                    height = q[i] + d * (q[i+d] - q[i]) / float(n[i+d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    def update(self, numbers):
+        """Add all the numbers in an iterable."""
+        for x in numbers:
+            self.add(x)
+
+    def _parabolic(self, i, d):
+        q = self._heights
+        n = self._positions
+        return q[i] + d / float(n[i+1] - n[i-1]) * (
+            (n[i] - n[i-1] + d) * (q[i+1] - q[i]) / float(n[i+1] - n[i]) +
+            (n[i+1] - n[i] - d) * (q[i] - q[i-1]) / float(n[i] - n[i-1]))
+
+    @property
+    def value(self):
+        """The current estimate. Raise ValueError if no numbers were added."""
+        if self.count == 0:
+            raise ValueError("can't calculate quantile of empty collection")
+        q = self._heights
+        if self.count <= 5:
+            low, fraction = _rank_position(self.count, self.p)
+            found = dict(enumerate(q))
+            return _interpolate(found, low, fraction)
+        if self.p == 0:
+            return q[0]
+        if self.p == 1:
+            return q[4]
+        return q[2]
+
+# Below this many numbers, sorting is faster than selection in Python.
+_SELECT_MIN = 10000
+
+# Our own generator for pivots, so selection neither consumes nor depends on
+# the application's ``random`` state.
+_random = random.Random()
+
+def _select(values, ranks, depth=0):
+    """Return a dict of the values at 0-based ``ranks`` in sorted order.
+
+    This is quickselect generalized to several ranks: partition around a
+    random pivot and recurse only into the parts containing wanted ranks.
+    ``values`` is a list which may be consumed. Small lists, and lists
+    that keep partitioning badly, are sorted instead.
+    """
+    if len(values) < _SELECT_MIN or depth > 32:
+        values.sort()
+        return dict((k, values[k]) for k in ranks)
+    pivot = _random.choice(values)
+    lower = [x for x in values if x < pivot]
+    upper = [x for x in values if pivot < x]
+    lower_count = len(lower)
+    upper_start = len(values) - len(upper)
+    del values[:]
+    found = {}
+    for k in ranks:
+        if lower_count <= k < upper_start:
+            found[k] = pivot
+    lower_ranks = [k for k in ranks if k < lower_count]
+    if lower_ranks:
+        found.update(_select(lower, lower_ranks, depth + 1))
+    upper_ranks = [k - upper_start for k in ranks if k >= upper_start]
+    if upper_ranks:
+        for k, value in _select(upper, upper_ranks, depth + 1).items():
+            found[k + upper_start] = value
+    return found
+
+# The NumPy module, imported by ``_get_numpy()`` on first use. False if
+# NumPy isn't installed.
+_numpy = None
+
+def _get_numpy():
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy
+
+def _as_array(r):
+    """Return ``r`` as a flat NumPy array if it's an array and NumPy is
+    available, else None.
+
+    NumPy arrays are recognized without importing NumPy: if one exists,
+    NumPy is already loaded. ``array.array`` and ``memoryview`` arguments
+    cause NumPy to be imported if it's installed.
+    """
+    if isinstance(r, (array.array, memoryview)):
+        numpy = _get_numpy()
+        if not numpy:
+            return None
+        return numpy.asarray(r).ravel()
+    numpy = sys.modules.get("numpy")
+    if numpy is not None and isinstance(r, numpy.ndarray):
+        return r.ravel()
+    return None
+
+def _array_median(a):
+    n = a.size
+    if n == 0:
+        raise ValueError("can't calculate median of empty collection")
+    partition = _get_numpy().partition
+    center = n // 2
+    if n % 2:
+        return partition(a, center)[center].item()
+    s = partition(a, [center-1, center])
+    return mean([s[center-1].item(), s[center].item()])
+
+def _rank_position(count, q):
+    """Return the rank below the quantile ``q`` of ``count`` numbers, and
+    the fraction of the way to the next rank."""
+    position = (count - 1) * q
+    low = int(math.floor(position))
+    if low >= count - 1:
+        return count - 1, 0
+    return low, position - low
+
+def _interpolate(found, low, fraction):
+    if not fraction:
+        return found[low]
+    return found[low] + (found[low + 1] - found[low]) * fraction
+
 def standard_deviation(r, sample=True):
     """Standard deviation. 
     
@@ -115,6 +449,9 @@ def standard_deviation(r, sample=True):
     (The results reported in Wikipedia are those expected for whole
     population statistics and therefore are equal to the ones we get
     by setting ``sample=False`` in the later tests.)
+
+    ``r`` may be any iterable, including a generator. An iterator is read
+    once via ``RunningStats``, without making a list.
     
     .. code-block:: pycon
     
@@ -132,13 +469,417 @@ def standard_deviation(r, sample=True):
         >>> standard_deviation([-32, -10, 20, 30, 60, 90, 100, 80, 60, 30, 10, -32], sample=False) # doctest: +ELLIPSIS
         43.2161878106906...
     """
-    avg = average(r)
-    sdsq = sum([(i - avg) ** 2 for i in r])
+    a = _as_array(r)
+    if a is not None:
+        if a.size == 0:
+            raise ValueError("can't calculate variance of empty collection")
+        if a.size == 1:
+            return 0.0
+        return float(a.std(ddof=1 if sample else 0))
+    try:
+        n = len(r)
+    except TypeError:
+        # An iterator: accumulate it in one pass.
+        return RunningStats(r).stdev(sample)
+    if n == 0:
+        raise ValueError("can't calculate variance of empty collection")
+    total, total_sq, _, m2 = _sequence_moments(r)
+    return _variance(n, total, total_sq, m2, sample) ** 0.5
+
+def _sequence_moments(seq):
+    """Return ``(total, total_sq, mean, m2)`` for a non-empty sequence.
+
+    This takes a few passes over ``seq`` with builtins running at C speed.
+    If the total is an exact rational, so are all the numbers, and
+    ``total_sq`` is the exact sum of their squares (``mean`` and ``m2`` are
+    None). Otherwise ``total_sq`` is None and ``m2`` is the sum of squared
+    differences from ``mean``, by the corrected two-pass algorithm.
+    """
+    n = len(seq)
+    total = sum(seq)
+    if isinstance(total, numbers.Rational):
+        return total, sum(map(operator.mul, seq, seq)), None, None
+    mean = total / n
+    diffs = list(map(operator.sub, seq, itertools.repeat(mean)))
+    m2 = sum(map(operator.mul, diffs, diffs)) - sum(diffs) ** 2 / n
+    return total, None, mean, m2
+
+def _variance(count, total, total_sq, m2, sample):
+    """The variance from exact sums (if ``total_sq`` isn't None) or ``m2``.
+    """
     if sample:
-        normal_denom=len(r) - 1 or 1
+        denom = count - 1 or 1
     else:
-        normal_denom=len(r)
-    return (sdsq / normal_denom) ** 0.5
+        denom = count
+    if total_sq is not None:
+        # Exact: n * sum(x**2) - sum(x)**2 == n * M2.
+        return float(count * total_sq - total ** 2) / (count * denom)
+    return m2 / denom
+
+# Types known to be ``numbers.Rational``, to skip the slow ABC check.
+_rational_types = set()
+
+def _is_rational_type(t):
+    if t in _rational_types:
+        return True
+    if issubclass(t, numbers.Rational):
+        _rational_types.add(t)
+        return True
+    return False
+
+_END = object()
+
+class RunningStats(object):
+    """Mean, variance, minimum and maximum of numbers seen one at a time.
+
+    I read each number once and keep only a few running totals, so I can
+    summarize a generator or a query result of any size. While all the
+    numbers are integers (or other exact rationals), I keep the exact sum
+    of their squares, so their variance is exact up to the final division.
+    From the first other number on, the variance is accumulated with
+    Welford's algorithm, which avoids the loss of precision of summing
+    squares::
+
+        >>> stats = RunningStats([2, 4, 4, 4, 5, 5, 7, 9])
+        >>> stats.count, stats.mean, stats.min, stats.max
+        (8, 5.0, 2, 9)
+        >>> stats.stdev(sample=False)
+        2.0
+
+    Partial results from chunks of data or from other processes can be
+    combined with ``.merge()``::
+
+        >>> a = RunningStats([2, 4, 4, 4])
+        >>> a.merge(RunningStats([5, 5, 7, 9])).stdev(sample=False)
+        2.0
+
+    ``.mean``, ``.variance()`` and ``.stdev()`` raise ValueError if no
+    numbers have been added. ``.min`` and ``.max`` are None in that case.
+    """
+
+    def __init__(self, numbers=()):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        # Exact mode keeps ``_total_sq``; Welford mode keeps ``_mean`` and
+        # ``_m2`` (the sum of squared differences from the mean) instead.
+        self._total_sq = 0
+        self._mean = None
+        self._m2 = None
+        self.update(numbers)
+
+    def __repr__(self):
+        return "<RunningStats count={0} min={1} max={2}>".format(
+            self.count, self.min, self.max)
+
+    def add(self, x):
+        """Add one number."""
+        if self._total_sq is not None and not _is_rational_type(type(x)):
+            self._start_welford()
+        self.count += 1
+        self.total += x
+        if self._total_sq is not None:
+            self._total_sq += x * x
+        else:
+            delta = x - self._mean
+            self._mean += delta / self.count
+            self._m2 += delta * (x - self._mean)
+        if self.min is None or x < self.min:
+            self.min = x
+        if self.max is None or x > self.max:
+            self.max = x
+
+    def update(self, numbers):
+        """Add all the numbers in an iterable.
+
+        A sized collection such as a list is summarized with a few passes
+        at C speed. An iterator is read once in a Python loop.
+        """
+        if hasattr(numbers, "__len__") and hasattr(numbers, "__getitem__"):
+            if len(numbers):
+                self.merge(self._from_sequence(numbers))
+            return
+        numbers = iter(numbers)
+        if self._total_sq is not None:
+            x = self._update_exact(numbers)
+            if x is _END:
+                return
+            self.add(x)    # Switches to Welford mode.
+        self._update_welford(numbers)
+
+    def merge(self, other):
+        """Add the numbers summarized by another ``RunningStats``.
+
+        Update me in place and return me. The result is the same as if I
+        had seen both sets of numbers myself (except for floating-point
+        rounding).
+        """
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.__dict__.update(other.__dict__)
+            return self
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if self._total_sq is not None and other._total_sq is not None:
+            self.count += other.count
+            self.total += other.total
+            self._total_sq += other._total_sq
+            return self
+        if self._total_sq is not None:
+            self._start_welford()
+        other_mean, other_m2 = other._welford_state()
+        count = self.count + other.count
+        delta = other_mean - self._mean
+        self._mean += delta * other.count / count
+        self._m2 += other_m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.total += other.total
+        return self
+
+    @property
+    def mean(self):
+        """The mean (average) of the numbers."""
+        if self.count == 0:
+            raise ValueError("can't calculate mean of empty collection")
+        return float(self.total) / self.count
+
+    def variance(self, sample=True):
+        """The variance of the numbers.
+
+        By default this is the unbiased sample variance, dividing by N - 1.
+        Pass ``sample=False`` for the population variance, dividing by N.
+        As in ``standard_deviation``, a single number has a sample variance
+        of 0.
+        """
+        if self.count == 0:
+            raise ValueError("can't calculate variance of empty collection")
+        return _variance(self.count, self.total, self._total_sq, self._m2,
+            sample)
+
+    def stdev(self, sample=True):
+        """The standard deviation: the square root of ``.variance()``."""
+        return self.variance(sample) ** 0.5
+
+    # Private methods.
+    @classmethod
+    def _from_sequence(cls, seq):
+        stats = cls()
+        stats.count = len(seq)
+        stats.min = min(seq)
+        stats.max = max(seq)
+        stats.total, stats._total_sq, stats._mean, stats._m2 = \
+            _sequence_moments(seq)
+        return stats
+
+    def _welford_state(self):
+        """Return ``(mean, m2)``, converting the exact sums if need be."""
+        if self._total_sq is None:
+            return self._mean, self._m2
+        n = self.count
+        if n == 0:
+            return 0.0, 0.0
+        mean = float(self.total) / n
+        return mean, float(n * self._total_sq - self.total ** 2) / n
+
+    def _start_welford(self):
+        self._mean, self._m2 = self._welford_state()
+        self._total_sq = None
+
+    def _update_exact(self, iterator):
+        """Add numbers while they're exact rationals.
+
+        Return the first number that isn't, or ``_END`` if there's none.
+        """
+        count = self.count
+        total = self.total
+        total_sq = self._total_sq
+        lo = self.min
+        hi = self.max
+        rational_types = _rational_types
+        stop = _END
+        for x in iterator:
+            t = type(x)
+            if t not in rational_types and not _is_rational_type(t):
+                stop = x
+                break
+            count += 1
+            total += x
+            total_sq += x * x
+            if lo is None or x < lo:
+                lo = x
+            if hi is None or x > hi:
+                hi = x
+        self.count = count
+        self.total = total
+        self._total_sq = total_sq
+        self.min = lo
+        self.max = hi
+        return stop
+
+    def _update_welford(self, iterator):
+        count = self.count
+        total = self.total
+        mean = self._mean
+        m2 = self._m2
+        lo = self.min
+        hi = self.max
+        for x in iterator:
+            count += 1
+            total += x
+            delta = x - mean
+            mean += delta / count
+            m2 += delta * (x - mean)
+            if lo is None or x < lo:
+                lo = x
+            if hi is None or x > hi:
+                hi = x
+        self.count = count
+        self.total = total
+        self._mean = mean
+        self._m2 = m2
+        self.min = lo
+        self.max = hi
+
+
+def histogram(r, bins=10, range=None):
+    """Count how many numbers fall in each of a series of bins.
+
+    Return a list of counts and a list of the bin edges, which is one
+    longer. The arguments and results are the same as NumPy's
+    ``numpy.histogram``:
+
+    ``bins`` is the number of equal-width bins, or an ascending sequence
+    of edges. Each bin includes its lower edge; the last bin also
+    includes its upper edge.
+
+    ``range`` is a ``(min, max)`` tuple giving the span of equal-width
+    bins. Numbers outside it aren't counted. By default it's the minimum
+    and maximum of the numbers, which means reading ``r`` twice, so it's
+    copied into a list first.
+
+        >>> histogram([1, 2, 2, 3, 3, 3, 4], 3)
+        ([1, 2, 4], [1.0, 2.0, 3.0, 4.0])
+        >>> histogram([1, 2, 2, 3, 3, 3, 4, 10], [0, 2, 4])
+        ([1, 6], [0, 2, 4])
+
+    Each number is placed by a binary search of the edges. To count a
+    stream in chunks or in several processes, use ``Histogram`` with a
+    fixed range and merge the results. NumPy arrays are counted with
+    ``numpy.histogram``.
+    """
+    a = _as_array(r)
+    if a is not None:
+        counts, edges = _get_numpy().histogram(a, bins, range)
+        return counts.tolist(), edges.tolist()
+    if range is None and isinstance(bins, numbers.Integral):
+        r = list(r)
+        range = (min(r), max(r)) if r else (0, 1)
+    hist = Histogram(bins, range, r)
+    return hist.counts, hist.edges
+
+class Histogram(object):
+    """Counts of numbers in a series of bins, added one at a time.
+
+    ``bins`` and ``range`` are as for ``histogram()``, except that a
+    number of bins requires a range, since the numbers aren't known yet::
+
+        >>> hist = Histogram(4, (0, 100))
+        >>> hist.update([5, 30, 35, 99, 100, 101])
+        >>> hist.counts, hist.outside
+        ([1, 2, 0, 2], 1)
+        >>> hist.edges
+        [0.0, 25.0, 50.0, 75.0, 100.0]
+
+    ``.counts`` is a list of the number of numbers in each bin, and
+    ``.outside`` is the number that fell outside all the bins.
+
+    Histograms with the same edges can be combined with ``.merge()``,
+    e.g., to add up partial counts from several processes.
+    """
+
+    def __init__(self, bins, range=None, numbers=()):
+        self.edges = _bin_edges(bins, range)
+        self.counts = [0] * (len(self.edges) - 1)
+        self.outside = 0
+        self.update(numbers)
+
+    def __repr__(self):
+        return "<Histogram bins={0} min={1} max={2}>".format(
+            len(self.counts), self.edges[0], self.edges[-1])
+
+    def add(self, x):
+        """Count one number."""
+        edges = self.edges
+        i = bisect.bisect_right(edges, x) - 1
+        if i == len(self.counts) and x == edges[-1]:
+            i -= 1
+        if 0 <= i < len(self.counts):
+            self.counts[i] += 1
+        else:
+            self.outside += 1
+
+    def update(self, numbers):
+        """Count all the numbers in an iterable."""
+        a = _as_array(numbers)
+        if a is not None:
+            counts = _get_numpy().histogram(a, self.edges)[0].tolist()
+            self.counts = [x + y for x, y in zip(self.counts, counts)]
+            self.outside += a.size - sum(counts)
+            return
+        # The same as calling ``.add`` for each number, with the lookups
+        # hoisted out of the loop.
+        edges = self.edges
+        counts = self.counts
+        n = len(counts)
+        last = edges[-1]
+        bisect_right = bisect.bisect_right
+        outside = 0
+        for x in numbers:
+            i = bisect_right(edges, x) - 1
+            if i == n and x == last:
+                i -= 1
+            if 0 <= i < n:
+                counts[i] += 1
+            else:
+                outside += 1
+        self.outside += outside
+
+    def merge(self, other):
+        """Add the counts of another ``Histogram`` with the same edges.
+
+        Update me in place and return me. Raise ValueError if the edges
+        differ.
+        """
+        if other.edges != self.edges:
+            raise ValueError("can't merge histograms with different bins")
+        self.counts = [x + y for x, y in zip(self.counts, other.counts)]
+        self.outside += other.outside
+        return self
+
+def _bin_edges(bins, span):
+    """Return the edges of ``bins`` like ``numpy.histogram_bin_edges``."""
+    if not isinstance(bins, numbers.Integral):
+        edges = list(bins)
+        if len(edges) < 2:
+            raise ValueError("need at least two bin edges")
+        for low, high in zip(edges, edges[1:]):
+            if low > high:
+                raise ValueError("bin edges must increase monotonically")
+        return edges
+    if bins < 1:
+        raise ValueError("'bins' must be >= 1")
+    if span is None:
+        raise ValueError("a number of bins requires a range")
+    low, high = span
+    if low > high:
+        raise ValueError("range minimum is larger than maximum")
+    if low == high:
+        low -= 0.5
+        high += 0.5
+    step = (high - low) / float(bins)
+    return [low + i * step for i in range(bins)] + [float(high)]
 
 
 #### Number formatting ####
@@ -178,41 +919,154 @@ def format_data_size(size, unit, precision=1, binary=False, full_name=False):
     # Contributed by Wojciech Malinowski
     if full_name is None:
         full_name = len(unit) > 1
-        
-    if not binary:
-        base = 1000
-        if full_name:
-            multiples = ('', 'kilo', 'mega', 'giga', 'tera', 'peta', 'exa', 'zetta', 'yotta')
-        else:
-            multiples = ('', 'k', 'M', 'G', 'T', 'P', 'E', 'Z', 'Y')
-    else:
-        base = 1024
-        if full_name:
-            multiples = ('', 'kibi', 'mebi', 'gibi', 'tebi', 'pebi', 'exbi', 'zebi', 'yobi')
-        else:
-            multiples = ('', 'Ki', 'Mi', 'Gi', 'Ti', 'Pi', 'Ei', 'Zi', 'Yi')
-            
+    base = 1024 if binary else 1000
+    multiples = _prefixes[bool(binary), bool(full_name)]
     sign = ""
     if size > 0:
-        m = int(math.log(size, base))
+        m = _prefix_index(size, base)
     elif size < 0:
         sign = "-"
         size = -size
-        m = int(math.log(size, base))
+        m = _prefix_index(size, base)
     else:
         m = 0
-    if m > 8:
-        m = 8
-
     if m == 0:
-        precision = '%.0f'
+        precision = 0
+    if m < 0:
+        divisor = math.pow(base, m)
     else:
-        precision = '%%.%df' % precision
-        
-    size = precision % (size / math.pow(base, m))
-
+        divisor = _divisors[base][m]
+    size = '%.*f' % (precision, size / divisor)
     return '%s%s %s%s' % (sign, size.strip(), multiples[m], unit)
 
+def format_data_sizes(sizes, unit, precision=1, binary=False, full_name=False):
+    """Format many numbers like ``format_data_size``.
+
+    ``sizes`` is an iterable of numbers. The other arguments are the same
+    as for ``format_data_size``. Return a list of strings identical to
+    calling ``format_data_size`` on each number, but faster.
+
+    >>> format_data_sizes([512, 2048, 3500000], "B")
+    ['512 B', '2.0 kB', '3.5 MB']
+
+    If ``sizes`` is a NumPy array (or an ``array.array``) and NumPy is
+    installed, the prefixes are chosen with vectorized operations.
+    """
+    if full_name is None:
+        full_name = len(unit) > 1
+    base = 1024 if binary else 1000
+    multiples = _prefixes[bool(binary), bool(full_name)]
+    divisors = _divisors[base]
+    thresholds = _thresholds[base]
+    a = _as_array(sizes)
+    if a is not None and a.dtype.kind in "iuf":
+        numpy = _get_numpy()
+        floats = a.astype(float)
+        negative = floats < 0
+        floats = numpy.where(negative, -floats, floats)
+        # Infinities, NaNs and fractions go through the scalar code below.
+        if numpy.isfinite(floats).all() and not (
+                (floats > 0) & (floats < 1)).any():
+            indexes = numpy.searchsorted(thresholds, floats, side="right")
+            values = floats / numpy.array(divisors)[indexes]
+            return ['%s%s %s%s' % ("-" if neg else "",
+                    ('%.*f' % (precision if m else 0, x)).strip(),
+                    multiples[m], unit)
+                for neg, m, x in zip(negative.tolist(), indexes.tolist(),
+                    values.tolist())]
+    top = thresholds[-1]
+    bisect_right = bisect.bisect_right
+    ret = []
+    for size in sizes:
+        sign = ""
+        if size < 0:
+            sign = "-"
+            size = -size
+        if 1 <= size < top:
+            m = bisect_right(thresholds, float(size))
+        elif size > 0:
+            m = _prefix_index(size, base)
+        else:
+            m = 0
+        if m < 0:
+            divisor = math.pow(base, m)
+        else:
+            divisor = divisors[m]
+        text = '%.*f' % (precision if m else 0, size / divisor)
+        ret.append('%s%s %s%s' % (sign, text.strip(), multiples[m], unit))
+    return ret
+
+# Prefixes for ``format_data_size``, keyed by ``(binary, full_name)``.
+_prefixes = {
+    (False, True): ('', 'kilo', 'mega', 'giga', 'tera', 'peta', 'exa',
+        'zetta', 'yotta'),
+    (False, False): ('', 'k', 'M', 'G', 'T', 'P', 'E', 'Z', 'Y'),
+    (True, True): ('', 'kibi', 'mebi', 'gibi', 'tebi', 'pebi', 'exbi',
+        'zebi', 'yobi'),
+    (True, False): ('', 'Ki', 'Mi', 'Gi', 'Ti', 'Pi', 'Ei', 'Zi', 'Yi'),
+    }
+
+# ``base ** m`` for each prefix, as ``format_data_size`` used to compute
+# them with ``math.pow``.
+_divisors = dict((base, [math.pow(base, m) for m in range(9)])
+    for base in (1000, 1024))
+
+def _log_thresholds(base):
+    """Return the smallest floats for which ``int(math.log(x, base))`` is
+    1, 2, ... 8.
+
+    ``format_data_size`` picks the prefix with that expression, whose
+    rounding decides sizes just below a power of ``base`` (e.g.,
+    999999999999999 bytes is "1.0 PB", not "1000.0 TB"). Finding the
+    boundaries once lets it look up the same answer with ``bisect``.
+    """
+    def bits(x):
+        return struct.unpack("<q", struct.pack("<d", x))[0]
+    def from_bits(i):
+        return struct.unpack("<d", struct.pack("<q", i))[0]
+    thresholds = []
+    for m in range(1, 9):
+        # Binary search over the bit patterns of positive floats, which
+        # sort in the same order as the floats themselves.
+        lo = bits(float(base ** (m - 1)))
+        hi = bits(float(base ** m) * 2)
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if int(math.log(from_bits(mid), base)) >= m:
+                hi = mid
+            else:
+                lo = mid
+        thresholds.append(from_bits(hi))
+    return thresholds
+
+_thresholds = dict((base, _log_thresholds(base)) for base in (1000, 1024))
+
+def _prefix_index(size, base):
+    """Return ``min(int(math.log(size, base)), 8)`` for positive ``size``.
+
+    This is negative for sizes below ``1 / base``.
+    """
+    thresholds = _thresholds[base]
+    if 1 <= size < thresholds[-1]:
+        return bisect.bisect_right(thresholds, float(size))
+    return min(int(math.log(size, base)), 8)
+
+def format_percents(percents, precision=1, missing=""):
+    """Format many percentages as strings like "12.5%".
+
+    ``percents`` is an iterable of numbers, e.g., from ``percents_of()``.
+    ``precision`` is the number of decimal places. Values that are None
+    (like the ``zero`` result of ``percents_of()``) are formatted as
+    ``missing``.
+
+        >>> format_percents(percents_of([1, 0, 2], [3, 0, 8]))
+        ['33.3%', '', '25.0%']
+
+    The format is built once for the whole column.
+    """
+    template = "%.{0}f%%".format(int(precision))
+    return [missing if x is None else template % x for x in percents]
+
 def format_byte_size(size, precision=1, binary=False, full_name=False):
     """Same as ``format_data_size`` but specifically for bytes.
     
@@ -23,6 +23,8 @@ __all__ = [
     "convert_accented_entities",
     "convert_misc_entities",
     "excerpt",
+    "iter_wrap_long_lines",
+    "iter_wrap_paragraphs",
     "lchop",
     "plural",
     "rchop",
@@ -33,6 +35,7 @@ __all__ = [
     "truncate", 
     "urlify",
     "wrap_long_lines",
+    "wrap_many",
     "wrap_paragraphs",
     ]
 
@@ -191,18 +194,21 @@ def wrap_long_lines(text, width=72):
     to splitting a line just before the last word or two, putting the
     orphan words on a separate line, in the middle of a paragraph.
     """
-    if isinstance(width, textwrap.TextWrapper):
-        wrapper = width
-        width = wrapper.width
-    else:
-        wrapper = textwrap.TextWrapper(width=width)
-    result = []
-    lines = text.splitlines(True)
+    return "".join(iter_wrap_long_lines(text.splitlines(True), width))
+
+def iter_wrap_long_lines(lines, width=72):
+    """Same as ``wrap_long_lines`` but lazy.
+
+    ``lines`` is any iterable of lines including their line endings, such as
+    a text file object or ``text.splitlines(True)``. Yield the wrapped lines
+    one at a time. A long line is yielded as a single chunk containing
+    embedded newlines.
+    """
+    wrapper, width = _get_wrapper(width)
     for lin in lines:
         if len(lin) > width:
             lin = wrapper.fill(lin) + "\n"
-        result.append(lin)
-    return "".join(result)
+        yield lin
 
 def wrap_paragraphs(text, width=72):
     """Wrap all paragraphs in a text string to the specified width.
@@ -220,33 +226,61 @@ def wrap_paragraphs(text, width=72):
     preserve preformatted text (tables, poetry, headers), but
     occasionally it may preserve short lines you wanted to join.
     """
-    if isinstance(width, textwrap.TextWrapper):
-        wrapper = width
-        width = wrapper.width
+    return "".join(iter_wrap_paragraphs(text.splitlines(True), width))
+
+def iter_wrap_paragraphs(lines, width=72):
+    """Same as ``wrap_paragraphs`` but lazy.
+
+    ``lines`` is any iterable of lines including their line endings, such as
+    a text file object or ``text.splitlines(True)``. Yield short lines
+    unchanged and each wrapped paragraph as a single chunk. Only the
+    paragraph currently being wrapped is held in memory.
+    """
+    wrapper, width = _get_wrapper(width)
+    paragraph = None
+    for lin in lines:
+        if paragraph is not None:
+            if not lin.isspace():
+                paragraph.append(lin)
+                continue
+            # End of paragraph; the blank line is handled below.
+            yield wrapper.fill("".join(paragraph)) + "\n"
+            paragraph = None
+        if len(lin) <= width:
+            # Leave short lines as-is.
+            yield lin
+        else:
+            # Found a long line, collect lines until end of paragraph.
+            paragraph = [lin]
+    if paragraph is not None:
+        yield wrapper.fill("".join(paragraph)) + "\n"
+
+def wrap_many(texts, width=72, paragraphs=True):
+    """Wrap each text string in an iterable, sharing one ``TextWrapper``.
+
+    ``texts`` is an iterable of strings, such as the bodies of a bulk
+    mailing. Yield each wrapped string in turn.
+
+    ``width`` may be an int or a ``textwrap.TextWrapper`` instance, as for
+    ``wrap_paragraphs()``. The wrapper is created once and reused for every
+    text.
+
+    ``paragraphs``: if true (default), wrap like ``wrap_paragraphs()``.
+    If false, wrap like ``wrap_long_lines()``.
+    """
+    wrapper, width = _get_wrapper(width)
+    if paragraphs:
+        wrap = iter_wrap_paragraphs
     else:
-        wrapper = textwrap.TextWrapper(width=width)
-    result = []
-    lines = text.splitlines(True)
-    lines_len = len(lines)
-    start = 0
-    end = None
-    while start < lines_len:
-        # Leave short lines as-is.
-        if len(lines[start]) <= width:
-            result.append(lines[start])
-            start += 1
-            continue
-        # Found a long line, peek forward to end of paragraph.
-        end = start + 1
-        while end < lines_len and not lines[end].isspace():
-            end += 1
-        # 'end' is one higher than last long lone.
-        paragraph = ''.join(lines[start:end])
-        paragraph = wrapper.fill(paragraph) + "\n"
-        result.append(paragraph)
-        start = end
-        end = None
-    return "".join(result)
+        wrap = iter_wrap_long_lines
+    for text in texts:
+        yield "".join(wrap(text.splitlines(True), wrapper))
+
+def _get_wrapper(width):
+    """Return a ``(TextWrapper, width)`` pair for a width argument."""
+    if isinstance(width, textwrap.TextWrapper):
+        return width, width.width
+    return textwrap.TextWrapper(width=width), width
 
 def series(*items, **kw):
     """Join strings using commas and a conjunction such as "and" or "or".